@@ -17,11 +17,16 @@ Features:
 import sqlite3
 import json
 import os
+import re
 import sys
 import asyncio
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 
 # MCP imports - using the official MCP Python SDK
 try:
@@ -34,6 +39,220 @@ except ImportError:
     sys.exit(1)
 
 
+# Per-connection tuning applied by ClaudeProjectKnowledgeManager._connect().
+# journal_mode=WAL is persistent in the database file and is set once in init_db.
+SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA journal_size_limit=6144000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=268435456",
+    # Wait for another process's write lock (e.g. Claude Desktop) instead of
+    # failing immediately with "database is locked"
+    "PRAGMA busy_timeout=5000",
+)
+
+# Timestamps of our own tables are unix-epoch INTEGERs: 8-byte keys that sort
+# as native ints. strftime('%s') rather than unixepoch() works before SQLite 3.38.
+EPOCH_NOW_SQL = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Body of the note mirrored into Claude Desktop's notes table for each entry
+NOTE_CONTENT_TEMPLATE = """Project: {project}
+Category: {category}
+Importance: {importance}/5
+Tags: {tags}
+Source: {source}
+
+{content}"""
+
+# Terms of the conversation summary that suggest_project_improvements reacts to;
+# none is a substring of another, so one finditer pass sees every term present.
+# Matched case-insensitively in place, without a lowercased copy of the summary.
+SUGGESTION_KEYWORDS = re.compile(r"code|prefer|limit|constraint", re.IGNORECASE)
+
+# Full-text index shadowing project_knowledge (external content table), kept
+# in sync by triggers so search_knowledge can use MATCH instead of LIKE scans
+# (tags are matched through the knowledge_tags table instead). The trigram
+# tokenizer indexes every 3-character substring, so a MATCH finds the same
+# substrings as LIKE '%query%' rather than whole words or word prefixes.
+FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS project_knowledge_fts USING fts5(
+        title, content,
+        content='project_knowledge', content_rowid='id',
+        tokenize='trigram'
+    )
+"""
+FTS_TRIGGERS_SQL = """
+    CREATE TRIGGER IF NOT EXISTS project_knowledge_ai AFTER INSERT ON project_knowledge BEGIN
+        INSERT INTO project_knowledge_fts (rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_knowledge_ad AFTER DELETE ON project_knowledge BEGIN
+        INSERT INTO project_knowledge_fts (project_knowledge_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_knowledge_au AFTER UPDATE ON project_knowledge BEGIN
+        INSERT INTO project_knowledge_fts (project_knowledge_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO project_knowledge_fts (rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END;
+"""
+FTS_DROP_TRIGGERS_SQL = """
+    DROP TRIGGER IF EXISTS project_knowledge_ai;
+    DROP TRIGGER IF EXISTS project_knowledge_ad;
+    DROP TRIGGER IF EXISTS project_knowledge_au;
+"""
+
+# Number of distinct searches whose results are kept by search_knowledge_page
+SEARCH_CACHE_SIZE = 256
+
+# Separator used when tags are aggregated with group_concat; cannot occur in tag text
+TAG_SEPARATOR = "\x1f"
+
+# Stored as the schema_version row of knowledge_server_meta once init_db has
+# brought a database up to date. Bump it whenever SCHEMA_SQL, a migration or
+# the FTS definition changes, so existing databases run init again on their
+# next start.
+SCHEMA_VERSION = 4
+
+# Our own key/value table for bookkeeping such as the schema version. The
+# database belongs to Claude Desktop, so PRAGMA user_version is left to it.
+META_TABLE_SQL = """CREATE TABLE IF NOT EXISTS knowledge_server_meta (
+    key TEXT PRIMARY KEY,
+    value
+) WITHOUT ROWID"""
+
+# The schema-version gate and the FTS check in one round trip
+SCHEMA_STATE_SQL = """
+    SELECT (SELECT value FROM knowledge_server_meta WHERE key = 'schema_version') AS version,
+           EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'project_knowledge_fts') AS has_fts
+"""
+
+PROJECT_CONTEXT_TABLE_SQL = f"""CREATE TABLE IF NOT EXISTS project_context (
+    context_key TEXT PRIMARY KEY,
+    context_value TEXT NOT NULL,
+    description TEXT,
+    updated_at INTEGER DEFAULT ({EPOCH_NOW_SQL})
+) WITHOUT ROWID"""
+
+# Schema created by init_db, applied as one script in a single transaction
+SCHEMA_SQL = f"""
+BEGIN;
+
+-- Claude Desktop's Project knowledge UI
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS project_knowledge (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    category TEXT NOT NULL,
+    tags TEXT,  -- legacy JSON array, superseded by knowledge_tags
+    importance INTEGER CHECK (importance BETWEEN 1 AND 5) DEFAULT 3,
+    source TEXT DEFAULT 'conversation',
+    created_at INTEGER DEFAULT ({EPOCH_NOW_SQL}),
+    updated_at INTEGER DEFAULT ({EPOCH_NOW_SQL})
+);
+
+CREATE TABLE IF NOT EXISTS project_instructions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    section TEXT NOT NULL,
+    content TEXT NOT NULL,
+    priority INTEGER CHECK (priority BETWEEN 1 AND 5) DEFAULT 3,
+    active BOOLEAN DEFAULT 1,
+    created_at INTEGER DEFAULT ({EPOCH_NOW_SQL}),
+    updated_at INTEGER DEFAULT ({EPOCH_NOW_SQL})
+);
+
+-- Dynamic context, clustered on context_key so lookups and upserts touch a
+-- single B-tree. Older rowid tables are converted by _migrate_context_table.
+{PROJECT_CONTEXT_TABLE_SQL};
+
+-- One row per tag; the primary key keeps an entry's tags in order and
+-- idx_knowledge_tags_tag turns tag lookups into an index seek
+CREATE TABLE IF NOT EXISTS knowledge_tags (
+    knowledge_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (knowledge_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_knowledge_tags_tag ON knowledge_tags (tag);
+
+-- Indexes matching the ORDER BY / WHERE clauses of the read paths, so
+-- listing and filtering walk an index instead of sorting. The instruction
+-- index is partial: deactivated rows are history and never listed.
+-- idx_knowledge_cat and idx_instructions_active are earlier, narrower versions.
+DROP INDEX IF EXISTS idx_knowledge_cat;
+DROP INDEX IF EXISTS idx_instructions_active;
+CREATE INDEX IF NOT EXISTS idx_knowledge_sort
+    ON project_knowledge (importance DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_cat_sort
+    ON project_knowledge (category, importance DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_instructions_priority
+    ON project_instructions (priority DESC, section) WHERE active = 1;
+
+-- At most one active instruction per section; this is the conflict target of
+-- update_instruction's UPSERT. Older databases could hold duplicates, so all
+-- but the newest are deactivated first.
+UPDATE project_instructions SET active = 0
+WHERE active = 1 AND id NOT IN (
+    SELECT MAX(id) FROM project_instructions WHERE active = 1 GROUP BY section
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_instructions_active_section
+    ON project_instructions (section) WHERE active = 1;
+
+-- Per-category entry counts kept current by triggers, so the statistics for
+-- suggest_project_improvements are read from one row per category instead
+-- of scanning project_knowledge. Recounted whenever this setup runs.
+-- importance may be NULL in rows written by other clients; those count as
+-- the default 3, so n_low never receives a NULL. The triggers are recreated
+-- so that databases carrying an older definition pick this up.
+CREATE TABLE IF NOT EXISTS project_knowledge_stats (
+    category TEXT PRIMARY KEY,
+    n_total INTEGER NOT NULL,
+    n_low INTEGER NOT NULL  -- entries with importance < 3
+) WITHOUT ROWID;
+DROP TRIGGER IF EXISTS project_knowledge_stats_ai;
+DROP TRIGGER IF EXISTS project_knowledge_stats_ad;
+DROP TRIGGER IF EXISTS project_knowledge_stats_au;
+CREATE TRIGGER project_knowledge_stats_ai AFTER INSERT ON project_knowledge BEGIN
+    INSERT INTO project_knowledge_stats (category, n_total, n_low)
+    VALUES (new.category, 1, COALESCE(new.importance, 3) < 3)
+    ON CONFLICT (category) DO UPDATE
+    SET n_total = n_total + 1, n_low = n_low + (COALESCE(new.importance, 3) < 3);
+END;
+CREATE TRIGGER project_knowledge_stats_ad AFTER DELETE ON project_knowledge BEGIN
+    UPDATE project_knowledge_stats
+    SET n_total = n_total - 1, n_low = n_low - (COALESCE(old.importance, 3) < 3)
+    WHERE category = old.category;
+    DELETE FROM project_knowledge_stats WHERE category = old.category AND n_total = 0;
+END;
+CREATE TRIGGER project_knowledge_stats_au
+AFTER UPDATE OF category, importance ON project_knowledge BEGIN
+    UPDATE project_knowledge_stats
+    SET n_total = n_total - 1, n_low = n_low - (COALESCE(old.importance, 3) < 3)
+    WHERE category = old.category;
+    DELETE FROM project_knowledge_stats WHERE category = old.category AND n_total = 0;
+    INSERT INTO project_knowledge_stats (category, n_total, n_low)
+    VALUES (new.category, 1, COALESCE(new.importance, 3) < 3)
+    ON CONFLICT (category) DO UPDATE
+    SET n_total = n_total + 1, n_low = n_low + (COALESCE(new.importance, 3) < 3);
+END;
+DELETE FROM project_knowledge_stats;
+INSERT INTO project_knowledge_stats (category, n_total, n_low)
+SELECT category, COUNT(*), COALESCE(SUM(COALESCE(importance, 3) < 3), 0)
+FROM project_knowledge GROUP BY category;
+
+COMMIT;
+"""
+
+
 class ProjectKnowledgeEntry(BaseModel):
     """Structure for project knowledge entries"""
     title: str
@@ -54,406 +273,877 @@ class ProjectInstruction(BaseModel):
 class ClaudeProjectKnowledgeManager:
     """Manages Claude Desktop project knowledge and instructions"""
     
-    def __init__(self, claude_db_path: str = None):
+    # Tags of the current project_knowledge row, in the order they were given
+    _TAGS_COLUMN = """
+        (SELECT group_concat(tag, char(31)) FROM knowledge_tags
+         WHERE knowledge_id = project_knowledge.id) AS tags
+    """
+    
+    # Each search variant is fixed SQL text, so its compiled statement is
+    # reused from the connection's statement cache; numbered binds let one
+    # value (e.g. the %query% pattern) serve several clauses. Every variant
+    # matches tags with the same substring rule, read from the narrow tag
+    # index, so FTS5 availability never changes which tags match.
+    _SEARCH_SQL = f"""
+        SELECT id, title, content, category, {_TAGS_COLUMN}, importance, source, created_at,
+               COUNT(*) OVER () AS total
+        FROM project_knowledge
+        -- The trigram MATCH narrows the candidates; the LIKE recheck keeps
+        -- exactly the fallback's semantics (ASCII-only case folding)
+        WHERE ((id IN (SELECT rowid FROM project_knowledge_fts WHERE project_knowledge_fts MATCH ?1)
+                AND (content LIKE ?2 OR title LIKE ?2))
+               OR id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag LIKE ?2))
+        ORDER BY importance DESC, created_at DESC
+        LIMIT ?3
+    """
+    _SEARCH_SQL_CAT = f"""
+        SELECT id, title, content, category, {_TAGS_COLUMN}, importance, source, created_at,
+               COUNT(*) OVER () AS total
+        FROM project_knowledge
+        -- The trigram MATCH narrows the candidates; the LIKE recheck keeps
+        -- exactly the fallback's semantics (ASCII-only case folding)
+        WHERE ((id IN (SELECT rowid FROM project_knowledge_fts WHERE project_knowledge_fts MATCH ?1)
+                AND (content LIKE ?2 OR title LIKE ?2))
+               OR id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag LIKE ?2)) AND category = ?4
+        ORDER BY importance DESC, created_at DESC
+        LIMIT ?3
+    """
+    # Substring scan, used when FTS5 is unavailable or the query is one the
+    # trigram index cannot answer (see _fts_query)
+    _SEARCH_LIKE_SQL = f"""
+        SELECT id, title, content, category, {_TAGS_COLUMN}, importance, source, created_at,
+               COUNT(*) OVER () AS total
+        FROM project_knowledge
+        WHERE (content LIKE ?1 OR title LIKE ?1
+               OR id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag LIKE ?1))
+        ORDER BY importance DESC, created_at DESC
+        LIMIT ?2
+    """
+    _SEARCH_LIKE_SQL_CAT = f"""
+        SELECT id, title, content, category, {_TAGS_COLUMN}, importance, source, created_at,
+               COUNT(*) OVER () AS total
+        FROM project_knowledge
+        WHERE (content LIKE ?1 OR title LIKE ?1
+               OR id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag LIKE ?1))
+          AND category = ?3
+        ORDER BY importance DESC, created_at DESC
+        LIMIT ?2
+    """
+    
+    def __init__(self, claude_db_path: str = None, use_fts: bool = True):
+        # use_fts=False answers every search with the LIKE scan, as on a
+        # SQLite build without FTS5; the index itself is still maintained
+        self.use_fts = use_fts
+        
         # Check for project context from environment variables
         self.project_id = os.environ.get('CLAUDE_PROJECT_ID')
         self.project_name = os.environ.get('CLAUDE_PROJECT_NAME')
         self.anthropic_api_key = os.environ.get('ANTHROPIC_API_KEY')
         
+        # The environment is fixed for the process lifetime, so everything
+        # derived from it is computed once instead of per tool call
+        self._project_prefix = f"[{self.project_name}] " if self.project_name else ""
+        self._project_label = self.project_name or 'Local'
+        self._context_snapshot = {
+            'project_id': self.project_id or 'None',
+            'project_name': self.project_name or 'Local Storage',
+            'has_api_key': bool(self.anthropic_api_key),
+            'storage_mode': 'API + Local' if self.project_id else 'Local Only'
+        }
+        
         # Fallback to local storage if no project context
         if claude_db_path is None:
             claude_db_path = os.path.expanduser(
                 "~/Library/Application Support/Claude/claudeSQLite.db"
             )
         self.db_path = claude_db_path
+        
+        # One long-lived connection keeps SQLite's page cache and parsed
+        # schema warm between tool calls; the lock serializes access to it and
+        # is reentrant so a method holding it can call other read methods
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        
+        # Results of recent searches, least recently used first. Cleared when
+        # this manager commits a transaction, or when PRAGMA data_version shows
+        # another connection (e.g. a second server process) has committed.
+        self._search_cache: "OrderedDict[Tuple, Tuple[int, List[Dict]]]" = OrderedDict()
+        self._search_data_version = None
+        self.search_cache_hits = 0
+        atexit.register(self._conn.close)
         self.init_db()
         
         print(f"🎯 Project Context: {self.project_name or 'Local Storage'} (ID: {self.project_id or 'None'})", file=sys.stderr)
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a database connection with the performance pragmas applied"""
+        # isolation_level=None: autocommit, transactions are opened explicitly.
+        # A file: URI (e.g. an in-memory test database) is passed through as one.
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=128,
+            uri=self.db_path.startswith("file:")
+        )
+        # Rows support both positional and by-name access; dict(row) is one C call
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def close(self):
+        """Close the shared connection; WAL is checkpointed and its files removed"""
+        with self._lock:
+            self._conn.close()
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements atomically on the shared connection"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn.cursor()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._search_cache.clear()
+    
     def init_db(self):
         """Initialize database with project knowledge tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._lock:
+            # WAL lets readers proceed while a write is in progress and
+            # turns each commit into an append instead of a journal rewrite
+            self._conn.execute("PRAGMA journal_mode=WAL")
             
-            # Create notes table (Claude Desktop's Project knowledge UI)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            cursor = self._conn.cursor()
             
-            # Create project_knowledge table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS project_knowledge (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    tags TEXT,  -- JSON array of tags
-                    importance INTEGER CHECK (importance BETWEEN 1 AND 5) DEFAULT 3,
-                    source TEXT DEFAULT 'conversation',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            # A database already at this schema version needs no DDL or
+            # migrations; only whether the FTS index exists has to be known.
+            # Creating the meta table is a no-op once it exists.
+            cursor.execute(META_TABLE_SQL)
+            version, has_fts = cursor.execute(SCHEMA_STATE_SQL).fetchone()
+            if version == SCHEMA_VERSION:
+                self.fts_available = bool(has_fts)
+                self.fts_enabled = self.fts_available and self.use_fts
+                return
             
-            # Create project_instructions table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS project_instructions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    section TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    priority INTEGER CHECK (priority BETWEEN 1 AND 5) DEFAULT 3,
-                    active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            # The whole schema is parsed and applied in one script and one transaction
+            cursor.executescript(SCHEMA_SQL)
             
-            # Create project_context table for dynamic context
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS project_context (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    context_key TEXT UNIQUE NOT NULL,
-                    context_value TEXT NOT NULL,
-                    description TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+            self._migrate_json_tags(cursor)
+            self._migrate_context_table(cursor)
+            self._migrate_text_timestamps(cursor)
+            self.fts_available = self._init_fts(cursor)
+            self.fts_enabled = self.fts_available and self.use_fts
+            cursor.execute(
+                "INSERT OR REPLACE INTO knowledge_server_meta (key, value) VALUES ('schema_version', ?)",
+                (SCHEMA_VERSION,)
+            )
+    
+    def _migrate_json_tags(self, cursor: sqlite3.Cursor):
+        """Move tags still stored as JSON in project_knowledge.tags into knowledge_tags"""
+        cursor.execute("SELECT id, tags FROM project_knowledge WHERE tags IS NOT NULL")
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        
+        tag_rows = [
+            (knowledge_id, position, tag)
+            for knowledge_id, tags in rows
+            for position, tag in enumerate(self._legacy_tags(tags))
+        ]
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO knowledge_tags (knowledge_id, position, tag) VALUES (?, ?, ?)",
+            tag_rows
+        )
+        cursor.execute("UPDATE project_knowledge SET tags = NULL WHERE tags IS NOT NULL")
+        cursor.execute("COMMIT")
+        print(f"🏷️ Migrated tags of {len(rows)} knowledge entries to knowledge_tags", file=sys.stderr)
+    
+    @staticmethod
+    def _legacy_tags(value) -> List[str]:
+        """Tags of a legacy tags value; malformed JSON is kept as one tag instead of failing the migration"""
+        try:
+            tags = json.loads(value)
+        except (ValueError, TypeError):
+            tags = value
+        if isinstance(tags, list):
+            return [str(tag) for tag in tags if tag is not None and str(tag).strip()]
+        if isinstance(tags, (str, int, float)) and str(tags).strip():
+            return [str(tags).strip()]
+        return []
+    
+    def _migrate_context_table(self, cursor: sqlite3.Cursor):
+        """Rebuild a project_context table from older versions (id + UNIQUE key) as WITHOUT ROWID"""
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'project_context'")
+        if "WITHOUT ROWID" in cursor.fetchone()['sql'].upper():
+            return
+        cursor.executescript(f"""
+            BEGIN;
+            ALTER TABLE project_context RENAME TO project_context_legacy;
+            {PROJECT_CONTEXT_TABLE_SQL};
+            INSERT INTO project_context (context_key, context_value, description, updated_at)
+            SELECT context_key, context_value, description, updated_at FROM project_context_legacy;
+            DROP TABLE project_context_legacy;
+            COMMIT;
+        """)
+        print("🗂️ Rebuilt project_context as a WITHOUT ROWID table", file=sys.stderr)
+    
+    def _migrate_text_timestamps(self, cursor: sqlite3.Cursor):
+        """Convert ISO timestamp strings left by older versions to unix-epoch integers"""
+        cursor.execute("BEGIN")
+        for table, column in (
+            ('project_knowledge', 'created_at'),
+            ('project_knowledge', 'updated_at'),
+            ('project_instructions', 'created_at'),
+            ('project_instructions', 'updated_at'),
+            ('project_context', 'updated_at'),
+        ):
+            cursor.execute(f"""
+                UPDATE {table} SET {column} = CAST(strftime('%s', {column}) AS INTEGER)
+                WHERE typeof({column}) = 'text'
             """)
-            
-            conn.commit()
+        cursor.execute("COMMIT")
+    
+    def _init_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """Create the FTS5 index and its sync triggers; False if FTS5 is unavailable"""
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'project_knowledge_fts'"
+        )
+        row = cursor.fetchone()
+        existed = row is not None
+        if existed and self._normalize_sql(row['sql']) != self._normalize_sql(FTS_TABLE_SQL):
+            # Index was created with an older definition: recreate and reindex
+            cursor.executescript(FTS_DROP_TRIGGERS_SQL + "DROP TABLE project_knowledge_fts;")
+            existed = False
+        try:
+            cursor.execute(FTS_TABLE_SQL)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ FTS5 unavailable, falling back to LIKE search: {e}", file=sys.stderr)
+            return False
+        
+        cursor.executescript(FTS_TRIGGERS_SQL)
+        if not existed:
+            # Index rows that were stored before the FTS table existed
+            cursor.execute(
+                "INSERT INTO project_knowledge_fts (project_knowledge_fts) VALUES ('rebuild')"
+            )
+        return True
+    
+    @staticmethod
+    def _normalize_sql(sql: str) -> str:
+        """Schema text from the USING clause on, with whitespace collapsed"""
+        return " ".join(sql[sql.index("USING"):].split())
+    
+    def disable_fts_triggers(self):
+        """Drop the FTS sync triggers ahead of a large import; call rebuild_fts_index afterwards"""
+        with self._lock:
+            self._conn.executescript(FTS_DROP_TRIGGERS_SQL)
+            self._search_cache.clear()
+    
+    def rebuild_fts_index(self):
+        """Rebuild the full-text index from project_knowledge and restore its triggers"""
+        if not self.fts_available:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO project_knowledge_fts (project_knowledge_fts) VALUES ('rebuild')"
+            )
+            self._conn.executescript(FTS_TRIGGERS_SQL)
+            # Writes on our own connection don't change PRAGMA data_version
+            self._search_cache.clear()
     
     def add_knowledge(self, entry: ProjectKnowledgeEntry) -> int:
         """Add new project knowledge entry - to Claude API if project context available, otherwise local"""
+        return self.add_knowledge_bulk([entry])[0]
+    
+    def add_knowledge_bulk(self, entries: List[ProjectKnowledgeEntry]) -> List[int]:
+        """Add several knowledge entries in a single transaction, returning their note IDs"""
         
         if self.project_id and self.anthropic_api_key:
             # TODO: Add to actual Claude project via API
-            print(f"🌐 Would add to Claude project {self.project_name} (ID: {self.project_id})", file=sys.stderr)
-            print(f"📝 Title: {entry.title}", file=sys.stderr)
-            print(f"🏷️ Category: {entry.category}", file=sys.stderr)
+            for entry in entries:
+                print(f"🌐 Would add to Claude project {self.project_name} (ID: {self.project_id})", file=sys.stderr)
+                print(f"📝 Title: {entry.title}", file=sys.stderr)
+                print(f"🏷️ Category: {entry.category}", file=sys.stderr)
             # For now, still store locally as we need API implementation
-            
-        # Store locally (either as fallback or primary)
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Format content with metadata for Claude Desktop's project knowledge
-            project_prefix = f"[{self.project_name}] " if self.project_name else ""
-            formatted_content = f"""Project: {self.project_name or 'Local'}
-Category: {entry.category}
-Importance: {entry.importance}/5
-Tags: {', '.join(entry.tags)}
-Source: {entry.source}
-
-{entry.content}"""
-            
-            # Insert into Claude Desktop's notes table (appears in Project knowledge UI)
-            cursor.execute("""
-                INSERT INTO notes (title, content, created_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (f"{project_prefix}{entry.title}", formatted_content))
-            
-            note_id = cursor.lastrowid
-            
-            # Also store in our custom table for advanced querying
-            cursor.execute("""
-                INSERT INTO project_knowledge 
-                (title, content, category, tags, importance, source)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
+        
+        # Format content with metadata for Claude Desktop's project knowledge
+        project_prefix = self._project_prefix
+        project_label = self._project_label
+        
+        notes_rows = []
+        knowledge_rows = []
+        for entry in entries:
+            formatted_content = NOTE_CONTENT_TEMPLATE.format_map({
+                'project': project_label,
+                'category': entry.category,
+                'importance': entry.importance,
+                'tags': ', '.join(entry.tags),
+                'source': entry.source,
+                'content': entry.content
+            })
+            notes_rows.append((project_prefix + entry.title, formatted_content))
+            knowledge_rows.append((
                 entry.title,
                 entry.content,
                 entry.category,
-                json.dumps(entry.tags),
                 entry.importance,
                 entry.source
             ))
+        
+        # Store locally (either as fallback or primary)
+        # The whole batch is one transaction, so N entries cost a single commit
+        with self._transaction() as cursor:
+            # Insert into Claude Desktop's notes table (appears in Project knowledge UI).
+            # notes belongs to Claude Desktop and must stay a real table, so this
+            # write is not folded into a view over project_knowledge.
+            cursor.executemany("""
+                INSERT INTO notes (title, content, created_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, notes_rows)
+            note_ids = self._inserted_ids(cursor, len(notes_rows))
             
-            conn.commit()
-            return note_id
+            # Also store in our custom table for advanced querying
+            cursor.executemany(f"""
+                INSERT INTO project_knowledge 
+                (title, content, category, importance, source, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, {EPOCH_NOW_SQL}, {EPOCH_NOW_SQL})
+            """, knowledge_rows)
+            knowledge_ids = self._inserted_ids(cursor, len(knowledge_rows))
+            
+            cursor.executemany(
+                "INSERT INTO knowledge_tags (knowledge_id, position, tag) VALUES (?, ?, ?)",
+                [
+                    (knowledge_id, position, tag)
+                    for entry, knowledge_id in zip(entries, knowledge_ids)
+                    for position, tag in enumerate(entry.tags)
+                ]
+            )
+            
+        return note_ids
+    
+    @staticmethod
+    def _inserted_ids(cursor: sqlite3.Cursor, count: int) -> List[int]:
+        """IDs of the last `count` rows inserted by an executemany in the current transaction"""
+        # The open write transaction excludes other writers, so the rows got
+        # consecutive rowids ending at last_insert_rowid()
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - count + 1, last_id + 1))
     
     def get_project_context(self) -> Dict[str, str]:
         """Get current project context information"""
-        return {
-            'project_id': self.project_id or 'None',
-            'project_name': self.project_name or 'Local Storage',
-            'has_api_key': bool(self.anthropic_api_key),
-            'storage_mode': 'API + Local' if self.project_id else 'Local Only'
-        }
+        return self._context_snapshot
     
     def update_instruction(self, instruction: ProjectInstruction) -> bool:
         """Update or add project instruction"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Check if instruction section exists
-            cursor.execute(
-                "SELECT id FROM project_instructions WHERE section = ? AND active = 1",
-                (instruction.section,)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing instruction
-                cursor.execute("""
-                    UPDATE project_instructions 
-                    SET content = ?, priority = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE section = ? AND active = 1
-                """, (instruction.content, instruction.priority, instruction.section))
-            else:
-                # Add new instruction
-                cursor.execute("""
-                    INSERT INTO project_instructions (section, content, priority)
-                    VALUES (?, ?, ?)
-                """, (instruction.section, instruction.content, instruction.priority))
-            
-            conn.commit()
-            return True
+        return self.update_instructions([instruction])
+    
+    def update_instructions(self, instructions: List[ProjectInstruction]) -> bool:
+        """Update or add several project instructions in a single transaction"""
+        # Insert a new section, or update the active one in the same statement
+        with self._transaction() as cursor:
+            cursor.executemany(f"""
+                INSERT INTO project_instructions (section, content, priority, created_at, updated_at)
+                VALUES (?, ?, ?, {EPOCH_NOW_SQL}, {EPOCH_NOW_SQL})
+                ON CONFLICT (section) WHERE active = 1 DO UPDATE
+                SET content = excluded.content,
+                    priority = excluded.priority,
+                    updated_at = excluded.updated_at
+            """, [(i.section, i.content, i.priority) for i in instructions])
+        return True
     
     def get_all_knowledge(self) -> List[Dict]:
         """Get all project knowledge entries"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, title, content, category, tags, importance, source, created_at
+        return list(self.iter_knowledge())
+    
+    def count_knowledge(self) -> int:
+        """Count project knowledge entries without reading them"""
+        # Summed from the trigger-maintained per-category counts
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(n_total), 0) FROM project_knowledge_stats"
+            ).fetchone()[0]
+    
+    def iter_knowledge(self, batch_size: int = 256) -> Iterator[Dict]:
+        """Yield all project knowledge entries in batches; writes made while iterating may show up"""
+        # Not a snapshot: the cursor stays open on the shared connection
+        # between batches, so an entry written mid-pass (by this manager or
+        # another client) can still be yielded later in the same pass
+        with self._lock:
+            cursor = self._conn.execute(f"""
+                SELECT id, title, content, category, {self._TAGS_COLUMN}, importance, source, created_at
                 FROM project_knowledge
                 ORDER BY importance DESC, created_at DESC
             """)
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'content': row[2],
-                    'category': row[3],
-                    'tags': json.loads(row[4]) if row[4] else [],
-                    'importance': row[5],
-                    'source': row[6],
-                    'created_at': row[7]
-                })
-            return results
+        # The lock is only held while a batch is fetched, never across a
+        # yield, so other calls can use the connection between batches
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield self._knowledge_row(row)
+    
+    def get_improvement_stats(self) -> Dict:
+        """Get the knowledge and instruction aggregates used for improvement suggestions"""
+        # One statement over the trigger-maintained per-category counts;
+        # categories and sections come back as JSON arrays, so names
+        # containing separators survive
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT COALESCE(SUM(n_total), 0) AS count,
+                       COALESCE(SUM(n_low), 0) AS low_importance,
+                       json_group_array(category) AS categories,
+                       (SELECT json_group_array(section) FROM project_instructions
+                        WHERE active = 1) AS sections
+                FROM project_knowledge_stats
+            """).fetchone()
+        return {
+            'count': row['count'],
+            'low_importance': row['low_importance'],
+            'categories': set(json.loads(row['categories'])),
+            'sections': json.loads(row['sections'])
+        }
+    
+    @staticmethod
+    def _knowledge_row(row: sqlite3.Row) -> Dict:
+        """Convert a project_knowledge row into a dict with its tags as a list"""
+        entry = dict(row)
+        entry['tags'] = entry['tags'].split(TAG_SEPARATOR) if entry['tags'] else []
+        return entry
+    
+    def get_knowledge_overview(self, per_category: int = 3) -> List[Dict]:
+        """Get knowledge counts per category with the top entries of each category"""
+        # One statement: per-category counts come from a window over the same
+        # rows, and only the displayed rows (no content/tags) leave SQLite
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT category, id, title, importance, count FROM (
+                    SELECT category, id, title, importance, created_at,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY category ORDER BY importance DESC, created_at DESC
+                           ) AS rn,
+                           COUNT(*) OVER (PARTITION BY category) AS count
+                    FROM project_knowledge
+                )
+                WHERE rn <= ?
+                ORDER BY importance DESC, created_at DESC
+            """, (per_category,)).fetchall()
+        
+        # Categories come out in order of their most important entry
+        overview = {}
+        for category, knowledge_id, title, importance, count in rows:
+            group = overview.setdefault(category, {
+                'category': category,
+                'count': count,
+                'items': []
+            })
+            group['items'].append({
+                'id': knowledge_id,
+                'title': title,
+                'importance': importance
+            })
+        return list(overview.values())
     
     def get_all_instructions(self) -> List[Dict]:
         """Get all active project instructions"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        with self._lock:
+            cursor = self._conn.execute("""
                 SELECT id, section, content, priority, created_at, updated_at
                 FROM project_instructions
                 WHERE active = 1
                 ORDER BY priority DESC, section
             """)
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row[0],
-                    'section': row[1],
-                    'content': row[2],
-                    'priority': row[3],
-                    'created_at': row[4],
-                    'updated_at': row[5]
-                })
-            return results
+            rows = cursor.fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    def count_instructions(self) -> int:
+        """Count active project instructions without reading them"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM project_instructions WHERE active = 1"
+            ).fetchone()[0]
+    
+    def get_knowledge_by_tags(self, tags: List[str]) -> List[Dict]:
+        """Get knowledge entries that carry every one of the given tags"""
+        if not tags:
+            return []
+        # The first tag drives an index seek on idx_knowledge_tags_tag; each
+        # further tag is one EXISTS probe per candidate row
+        conditions = ["id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag = ?)"]
+        conditions.extend(
+            "EXISTS (SELECT 1 FROM knowledge_tags"
+            " WHERE knowledge_id = project_knowledge.id AND tag = ?)"
+            for _ in tags[1:]
+        )
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT id, title, content, category, {self._TAGS_COLUMN}, importance, source, created_at
+                FROM project_knowledge
+                WHERE {' AND '.join(conditions)}
+                ORDER BY importance DESC, created_at DESC
+            """, tags).fetchall()
+        
+        return [self._knowledge_row(row) for row in rows]
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn free text into a trigram FTS5 phrase query; empty if the LIKE scan must answer it"""
+        # Trigrams need at least 3 characters, and % or _ are LIKE wildcards
+        # that a literal phrase would not honour
+        if len(query) < 3 or "%" in query or "_" in query:
+            return ""
+        return '"' + query.replace('"', '""') + '"'
     
     def search_knowledge(self, query: str, category: str = None) -> List[Dict]:
         """Search project knowledge"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            base_query = """
-                SELECT id, title, content, category, tags, importance, source, created_at
-                FROM project_knowledge
-                WHERE (content LIKE ? OR title LIKE ? OR tags LIKE ?)
-            """
-            params = [f"%{query}%", f"%{query}%", f"%{query}%"]
-            
-            if category:
-                base_query += " AND category = ?"
-                params.append(category)
-            
-            base_query += " ORDER BY importance DESC, created_at DESC"
-            
-            cursor.execute(base_query, params)
+        return self.search_knowledge_page(query, category)[1]
+    
+    def search_knowledge_page(self, query: str, category: str = None,
+                              limit: int = -1) -> Tuple[int, List[Dict]]:
+        """Search project knowledge, returning the total match count and the top `limit` entries"""
+        # Repeated searches are answered from the cache; the lock is held
+        # throughout so no commit can slip between the query and the store.
+        # Every caller gets its own copy, so modifying a result is harmless.
+        key = (query, category, limit)
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._search_data_version:
+                self._search_cache.clear()
+                self._search_data_version = data_version
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                self._search_cache.move_to_end(key)
+                self.search_cache_hits += 1
+                return self._copy_page(cached)
             
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'content': row[2],
-                    'category': row[3],
-                    'tags': json.loads(row[4]) if row[4] else [],
-                    'importance': row[5],
-                    'source': row[6],
-                    'created_at': row[7]
-                })
-            return results
+            page = self._search_uncached(query, category, limit)
+            self._search_cache[key] = page
+            if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+            return self._copy_page(page)
+    
+    @staticmethod
+    def _copy_page(page: Tuple[int, List[Dict]]) -> Tuple[int, List[Dict]]:
+        """Copy a cached search result down to each entry's tag list"""
+        total, results = page
+        return total, [dict(entry, tags=list(entry['tags'])) for entry in results]
+    
+    def _search_uncached(self, query: str, category: Optional[str],
+                         limit: int) -> Tuple[int, List[Dict]]:
+        """Run a search against the database, bypassing the result cache"""
+        # The LIMIT is applied in SQL, so rows past it never reach Python;
+        # COUNT(*) OVER () still reports every match. -1 means no limit.
+        match = self._fts_query(query) if self.fts_enabled else ""
+        if match:
+            params = (match, f"%{query}%", limit)
+            sql = self._SEARCH_SQL_CAT if category else self._SEARCH_SQL
+        else:
+            params = (f"%{query}%", limit)
+            sql = self._SEARCH_LIKE_SQL_CAT if category else self._SEARCH_LIKE_SQL
+        if category:
+            params += (category,)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        total = rows[0]['total'] if rows else 0
+        results = []
+        for row in rows:
+            entry = self._knowledge_row(row)
+            del entry['total']
+            results.append(entry)
+        return total, results
     
     def update_context(self, key: str, value: str, description: str = None) -> bool:
         """Update dynamic project context"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        return self.update_contexts([(key, value, description)])
+    
+    def update_contexts(self, items: List[Tuple[str, str, Optional[str]]]) -> bool:
+        """Update several (key, value, description) context items in a single transaction"""
+        with self._transaction() as cursor:
+            cursor.executemany(f"""
                 INSERT OR REPLACE INTO project_context 
                 (context_key, context_value, description, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            """, (key, value, description))
-            conn.commit()
-            return True
+                VALUES (?, ?, ?, {EPOCH_NOW_SQL})
+            """, items)
+        return True
     
     def get_context(self) -> Dict[str, Dict]:
         """Get all project context"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        with self._lock:
+            cursor = self._conn.execute("""
                 SELECT context_key, context_value, description, updated_at
                 FROM project_context
                 ORDER BY updated_at DESC
             """)
-            
-            context = {}
-            for row in cursor.fetchall():
-                context[row[0]] = {
-                    'value': row[1],
-                    'description': row[2],
-                    'updated_at': row[3]
+            rows = cursor.fetchall()
+        
+        return {
+            row['context_key']: {
+                'value': row['context_value'],
+                'description': row['description'],
+                'updated_at': row['updated_at']
+            }
+            for row in rows
+        }
+    
+    def get_overview_bundle(self) -> Dict[str, Any]:
+        """Get knowledge overview, instructions and context from one read transaction"""
+        # The lock is reentrant, so the getters run inside this transaction
+        # and see one consistent snapshot of the database
+        with self._lock:
+            self._conn.execute("BEGIN DEFERRED")
+            try:
+                return {
+                    'knowledge': self.get_knowledge_overview(),
+                    'instructions': self.get_all_instructions(),
+                    'context': self.get_context()
                 }
-            return context
+            finally:
+                self._conn.execute("COMMIT")
     
     def get_claude_desktop_notes(self) -> List[Dict]:
         """Get notes from Claude Desktop's UI (what appears in Project knowledge)"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        with self._lock:
+            cursor = self._conn.execute("""
                 SELECT id, title, content, created_at
                 FROM notes
                 ORDER BY created_at DESC
             """)
+            rows = cursor.fetchall()
+        
+        return [dict(row) for row in rows]
+
+
+class KnowledgeWriter:
+    """Background writer that batches queued knowledge entries into single transactions"""
+    
+    BATCH_SIZE = 50
+    BATCH_WINDOW = 0.01  # seconds to wait for more entries before writing
+    
+    def __init__(self, manager: ClaudeProjectKnowledgeManager):
+        self.manager = manager
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the writer loop on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(self._queue))
+    
+    async def stop(self):
+        """Stop the writer loop once every entry queued so far has been written"""
+        queue, task = self._queue, self._task
+        # add() calls from now on write directly instead of queueing
+        self._queue = self._task = None
+        if task is None:
+            return
+        if not task.done():
+            # The sentinel lands behind every queued entry, so the loop
+            # writes them all before it returns
+            await queue.put(None)
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Only left over if the loop ended early; their callers must not hang
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                self._fail(item[1], RuntimeError("knowledge writer stopped"))
+    
+    async def add(self, entry: ProjectKnowledgeEntry) -> int:
+        """Queue an entry and wait for its note ID; writes directly if the writer isn't running"""
+        if self._queue is None:
+            return await asyncio.to_thread(self.manager.add_knowledge, entry)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((entry, future))
+        return await future
+    
+    @staticmethod
+    def _fail(future: asyncio.Future, error: BaseException):
+        if not future.done():
+            future.set_exception(error)
+    
+    async def _run(self, queue: asyncio.Queue):
+        # The queue is passed in because stop() detaches it from self first
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.BATCH_WINDOW
+            while len(batch) < self.BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    # stop() was called: write what was collected, then end
+                    stopping = True
+                    break
+                batch.append(item)
             
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'content': row[2],
-                    'created_at': row[3]
-                })
-            return results
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Cancelled mid-batch: its callers get an error instead of hanging
+                for _, future in batch:
+                    self._fail(future, RuntimeError("knowledge writer cancelled"))
+                raise
+    
+    async def _write(self, batch: List[Tuple[ProjectKnowledgeEntry, asyncio.Future]]):
+        """Write one batch in a single transaction and resolve its futures"""
+        try:
+            note_ids = await asyncio.to_thread(
+                self.manager.add_knowledge_bulk, [entry for entry, _ in batch]
+            )
+        except Exception:
+            # The batch was rolled back; retry entries one by one so a
+            # single bad entry doesn't fail the others queued with it
+            for entry, future in batch:
+                try:
+                    note_id = await asyncio.to_thread(self.manager.add_knowledge, entry)
+                except Exception as e:
+                    self._fail(future, e)
+                else:
+                    if not future.done():
+                        future.set_result(note_id)
+        else:
+            for (_, future), note_id in zip(batch, note_ids):
+                if not future.done():
+                    future.set_result(note_id)
 
 
 # Initialize the knowledge manager
 knowledge_manager = ClaudeProjectKnowledgeManager()
+knowledge_writer = KnowledgeWriter(knowledge_manager)
 
 # Create MCP server
 server = Server("claude-project-knowledge")
 
 # Define MCP tools
+# Built once at import: clients may call tools/list on every reconnect and the
+# definitions never change at runtime
+_TOOLS: List[Tool] = [
+    Tool(
+        name="add_project_knowledge",
+        description="Add new knowledge to the current Claude Desktop project. Use this when you learn something important that should be remembered for future conversations.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "Clear, descriptive title for this knowledge"},
+                "content": {"type": "string", "description": "Detailed content of the knowledge"},
+                "category": {"type": "string", "description": "Category like 'technical', 'business', 'preferences', 'constraints'"},
+                "tags": {"type": "array", "items": {"type": "string"}, "description": "Tags for organization"},
+                "importance": {"type": "integer", "minimum": 1, "maximum": 5, "description": "Importance level (1=low, 5=critical)"}
+            },
+            "required": ["title", "content", "category"]
+        }
+    ),
+    Tool(
+        name="update_project_instructions",
+        description="Update or add instructions for this Claude Desktop project. Use this to modify how Claude should behave in this project context.",
+        inputSchema={
+            "type": "object", 
+            "properties": {
+                "section": {"type": "string", "description": "Instruction section like 'context', 'guidelines', 'constraints', 'objectives'"},
+                "content": {"type": "string", "description": "The instruction content"},
+                "priority": {"type": "integer", "minimum": 1, "maximum": 5, "description": "Priority level (1=low, 5=critical)"}
+            },
+            "required": ["section", "content"]
+        }
+    ),
+    Tool(
+        name="search_project_knowledge",
+        description="Search existing project knowledge. Use this to check what's already known before adding duplicate information.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Search query"},
+                "category": {"type": "string", "description": "Optional category filter"}
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="get_project_overview",
+        description="Get a complete overview of current project knowledge and instructions. Use this to understand the current project context.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="update_project_context",
+        description="Update dynamic project context (current focus, active tasks, etc.). Use this to track what's currently happening in the project.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "key": {"type": "string", "description": "Context key like 'current_focus', 'active_task', 'last_discussion'"},
+                "value": {"type": "string", "description": "Current value"},
+                "description": {"type": "string", "description": "Optional description of this context"}
+            },
+            "required": ["key", "value"]
+        }
+    ),
+    Tool(
+        name="suggest_project_improvements",
+        description="Analyze current conversation and suggest improvements to project knowledge or instructions.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "conversation_summary": {"type": "string", "description": "Summary of current conversation"},
+                "focus_areas": {"type": "array", "items": {"type": "string"}, "description": "Areas to focus suggestions on"}
+            },
+            "required": ["conversation_summary"]
+        }
+    ),
+    Tool(
+        name="get_claude_desktop_notes",
+        description="Get all notes that appear in Claude Desktop's Project knowledge UI. Use this to see what's actually visible in the interface.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="check_project_context",
+        description="Check current project context and configuration status. Shows which project (if any) the MCP server is connected to.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "additionalProperties": False
+        }
+    )
+]
+
+
 @server.list_tools()
 async def list_tools() -> List[Tool]:
     """List available tools"""
-    return [
-        Tool(
-            name="add_project_knowledge",
-            description="Add new knowledge to the current Claude Desktop project. Use this when you learn something important that should be remembered for future conversations.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "title": {"type": "string", "description": "Clear, descriptive title for this knowledge"},
-                    "content": {"type": "string", "description": "Detailed content of the knowledge"},
-                    "category": {"type": "string", "description": "Category like 'technical', 'business', 'preferences', 'constraints'"},
-                    "tags": {"type": "array", "items": {"type": "string"}, "description": "Tags for organization"},
-                    "importance": {"type": "integer", "minimum": 1, "maximum": 5, "description": "Importance level (1=low, 5=critical)"}
-                },
-                "required": ["title", "content", "category"]
-            }
-        ),
-        Tool(
-            name="update_project_instructions",
-            description="Update or add instructions for this Claude Desktop project. Use this to modify how Claude should behave in this project context.",
-            inputSchema={
-                "type": "object", 
-                "properties": {
-                    "section": {"type": "string", "description": "Instruction section like 'context', 'guidelines', 'constraints', 'objectives'"},
-                    "content": {"type": "string", "description": "The instruction content"},
-                    "priority": {"type": "integer", "minimum": 1, "maximum": 5, "description": "Priority level (1=low, 5=critical)"}
-                },
-                "required": ["section", "content"]
-            }
-        ),
-        Tool(
-            name="search_project_knowledge",
-            description="Search existing project knowledge. Use this to check what's already known before adding duplicate information.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "Search query"},
-                    "category": {"type": "string", "description": "Optional category filter"}
-                },
-                "required": ["query"]
-            }
-        ),
-        Tool(
-            name="get_project_overview",
-            description="Get a complete overview of current project knowledge and instructions. Use this to understand the current project context.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "additionalProperties": False
-            }
-        ),
-        Tool(
-            name="update_project_context",
-            description="Update dynamic project context (current focus, active tasks, etc.). Use this to track what's currently happening in the project.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "key": {"type": "string", "description": "Context key like 'current_focus', 'active_task', 'last_discussion'"},
-                    "value": {"type": "string", "description": "Current value"},
-                    "description": {"type": "string", "description": "Optional description of this context"}
-                },
-                "required": ["key", "value"]
-            }
-        ),
-        Tool(
-            name="suggest_project_improvements",
-            description="Analyze current conversation and suggest improvements to project knowledge or instructions.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "conversation_summary": {"type": "string", "description": "Summary of current conversation"},
-                    "focus_areas": {"type": "array", "items": {"type": "string"}, "description": "Areas to focus suggestions on"}
-                },
-                "required": ["conversation_summary"]
-            }
-        ),
-        Tool(
-            name="get_claude_desktop_notes",
-            description="Get all notes that appear in Claude Desktop's Project knowledge UI. Use this to see what's actually visible in the interface.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "additionalProperties": False
-            }
-        ),
-        Tool(
-            name="check_project_context",
-            description="Check current project context and configuration status. Shows which project (if any) the MCP server is connected to.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "additionalProperties": False
-            }
-        )
-    ]
+    return _TOOLS
+
 
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> List[TextContent]:
     """Handle tool calls"""
+    # Database calls run in worker threads via asyncio.to_thread so the stdio
+    # event loop keeps serving; the manager's lock serializes the connection
     
     if name == "add_project_knowledge":
         entry = ProjectKnowledgeEntry(
@@ -464,7 +1154,7 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
             importance=arguments.get("importance", 3)
         )
         
-        note_id = knowledge_manager.add_knowledge(entry)
+        note_id = await knowledge_writer.add(entry)
         context = knowledge_manager.get_project_context()
         
         # Prepare status message without backslashes in f-string
@@ -484,7 +1174,7 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
             priority=arguments.get("priority", 3)
         )
         
-        success = knowledge_manager.update_instruction(instruction)
+        success = await asyncio.to_thread(knowledge_manager.update_instruction, instruction)
         if success:
             return [TextContent(
                 type="text",
@@ -497,130 +1187,136 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
             )]
     
     elif name == "search_project_knowledge":
-        results = knowledge_manager.search_knowledge(
-            query=arguments["query"],
-            category=arguments.get("category")
+        query = arguments["query"]
+        total, results = await asyncio.to_thread(
+            knowledge_manager.search_knowledge_page,
+            query,
+            arguments.get("category"),
+            5  # Only the top 5 results are shown
         )
         
         if not results:
             return [TextContent(
                 type="text",
-                text=f"No project knowledge found for query: '{arguments['query']}'"
+                text=f"No project knowledge found for query: '{query}'"
             )]
         
-        response = f"Found {len(results)} knowledge entries for '{arguments['query']}':\n\n"
-        for item in results[:5]:  # Limit to top 5 results
-            response += f"**{item['title']}** ({item['category']}, importance: {item['importance']})\n"
-            response += f"{item['content'][:200]}{'...' if len(item['content']) > 200 else ''}\n"
-            response += f"Tags: {', '.join(item['tags'])}\n\n"
+        parts = [f"Found {total} knowledge entries for '{query}':\n\n"]
+        for item in results:
+            content = item['content']
+            parts.append(f"**{item['title']}** ({item['category']}, importance: {item['importance']})\n")
+            parts.append(f"{content[:200]}{'...' if len(content) > 200 else ''}\n")
+            parts.append(f"Tags: {', '.join(item['tags'])}\n\n")
         
-        return [TextContent(type="text", text=response)]
+        return [TextContent(type="text", text="".join(parts))]
     
     elif name == "get_project_overview":
-        knowledge = knowledge_manager.get_all_knowledge()
-        instructions = knowledge_manager.get_all_instructions()
-        context = knowledge_manager.get_context()
+        bundle = await asyncio.to_thread(knowledge_manager.get_overview_bundle)
+        knowledge_overview = bundle['knowledge']
+        instructions = bundle['instructions']
+        context = bundle['context']
         
-        response = "# Project Overview\n\n"
+        parts = ["# Project Overview\n\n"]
         
         # Current Context
         if context:
-            response += "## Current Context\n"
+            parts.append("## Current Context\n")
             for key, data in context.items():
-                response += f"- **{key}**: {data['value']}\n"
+                parts.append(f"- **{key}**: {data['value']}\n")
                 if data['description']:
-                    response += f"  _{data['description']}_\n"
-            response += "\n"
+                    parts.append(f"  _{data['description']}_\n")
+            parts.append("\n")
         
         # Instructions
         if instructions:
-            response += "## Project Instructions\n"
+            parts.append("## Project Instructions\n")
             for inst in instructions:
-                response += f"### {inst['section'].title()} (Priority: {inst['priority']})\n"
-                response += f"{inst['content']}\n\n"
+                parts.append(f"### {inst['section'].title()} (Priority: {inst['priority']})\n")
+                parts.append(f"{inst['content']}\n\n")
         
         # Knowledge Summary
-        if knowledge:
-            response += "## Knowledge Summary\n"
-            categories = {}
-            for item in knowledge:
-                cat = item['category']
-                if cat not in categories:
-                    categories[cat] = []
-                categories[cat].append(item)
-            
-            for category, items in categories.items():
-                response += f"### {category.title()} ({len(items)} items)\n"
-                for item in items[:3]:  # Top 3 per category
-                    response += f"- **{item['title']}** (importance: {item['importance']})\n"
-                if len(items) > 3:
-                    response += f"- ... and {len(items) - 3} more\n"
-                response += "\n"
+        if knowledge_overview:
+            parts.append("## Knowledge Summary\n")
+            for group in knowledge_overview:
+                parts.append(f"### {group['category'].title()} ({group['count']} items)\n")
+                for item in group['items']:  # Top 3 per category
+                    parts.append(f"- **{item['title']}** (importance: {item['importance']})\n")
+                if group['count'] > 3:
+                    parts.append(f"- ... and {group['count'] - 3} more\n")
+                parts.append("\n")
         else:
-            response += "## Knowledge Summary\nNo project knowledge stored yet.\n\n"
+            parts.append("## Knowledge Summary\nNo project knowledge stored yet.\n\n")
         
-        return [TextContent(type="text", text=response)]
+        return [TextContent(type="text", text="".join(parts))]
     
     elif name == "update_project_context":
-        success = knowledge_manager.update_context(
-            key=arguments["key"],
-            value=arguments["value"],
-            description=arguments.get("description")
+        key = arguments["key"]
+        value = arguments["value"]
+        success = await asyncio.to_thread(
+            knowledge_manager.update_context,
+            key,
+            value,
+            arguments.get("description")
         )
         
         if success:
             return [TextContent(
                 type="text",
-                text=f"✅ Updated project context '{arguments['key']}' = '{arguments['value']}'"
+                text=f"✅ Updated project context '{key}' = '{value}'"
             )]
         else:
             return [TextContent(
                 type="text",
-                text=f"❌ Failed to update project context '{arguments['key']}'"
+                text=f"❌ Failed to update project context '{key}'"
             )]
     
     elif name == "suggest_project_improvements":
         # Analyze current state and suggest improvements
-        knowledge = knowledge_manager.get_all_knowledge()
-        instructions = knowledge_manager.get_all_instructions()
-        conversation_summary = arguments["conversation_summary"]
+        stats = await asyncio.to_thread(knowledge_manager.get_improvement_stats)
+        sections = stats['sections']
+        
+        # A single scan for all keywords
+        mentioned = set()
+        for match in SUGGESTION_KEYWORDS.finditer(arguments["conversation_summary"]):
+            mentioned.add(match.group().lower())
+            if len(mentioned) == 4:
+                break
         
         suggestions = []
         
         # Analyze knowledge gaps
-        categories = set(item['category'] for item in knowledge)
-        if 'technical' not in categories and 'code' in conversation_summary.lower():
+        categories = stats['categories']
+        if 'technical' not in categories and 'code' in mentioned:
             suggestions.append("Consider adding technical knowledge about coding practices or architecture")
         
-        if 'preferences' not in categories and 'prefer' in conversation_summary.lower():
+        if 'preferences' not in categories and 'prefer' in mentioned:
             suggestions.append("Consider documenting user preferences mentioned in conversations")
         
         # Analyze instruction gaps
-        instruction_sections = set(inst['section'] for inst in instructions)
-        if 'constraints' not in instruction_sections and ('limit' in conversation_summary.lower() or 'constraint' in conversation_summary.lower()):
+        instruction_sections = set(sections)
+        if 'constraints' not in instruction_sections and ('limit' in mentioned or 'constraint' in mentioned):
             suggestions.append("Consider adding constraint instructions based on mentioned limitations")
         
-        if 'guidelines' not in instruction_sections and len(knowledge) > 5:
+        if 'guidelines' not in instruction_sections and stats['count'] > 5:
             suggestions.append("Consider adding guideline instructions for how to use the accumulated knowledge")
         
         # Knowledge organization suggestions
-        if len(knowledge) > 10:
-            low_importance = [k for k in knowledge if k['importance'] < 3]
-            if len(low_importance) > 5:
-                suggestions.append(f"Consider reviewing {len(low_importance)} low-importance knowledge entries for relevance")
+        if stats['count'] > 10:
+            if stats['low_importance'] > 5:
+                suggestions.append(f"Consider reviewing {stats['low_importance']} low-importance knowledge entries for relevance")
         
-        response = "# Project Improvement Suggestions\n\n"
+        parts = ["# Project Improvement Suggestions\n\n"]
         if suggestions:
             for i, suggestion in enumerate(suggestions, 1):
-                response += f"{i}. {suggestion}\n"
-            response += f"\nBased on analysis of {len(knowledge)} knowledge entries and {len(instructions)} instruction sections."
+                parts.append(f"{i}. {suggestion}\n")
+            parts.append(f"\nBased on analysis of {stats['count']} knowledge entries and {len(sections)} instruction sections.")
         else:
-            response += "No specific improvements suggested at this time. The project knowledge appears well-organized."
+            parts.append("No specific improvements suggested at this time. The project knowledge appears well-organized.")
         
-        return [TextContent(type="text", text=response)]
+        return [TextContent(type="text", text="".join(parts))]
     
     elif name == "get_claude_desktop_notes":
-        notes = knowledge_manager.get_claude_desktop_notes()
+        notes = await asyncio.to_thread(knowledge_manager.get_claude_desktop_notes)
         
         if not notes:
             return [TextContent(
@@ -628,14 +1324,14 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
                 text="No notes found in Claude Desktop's Project knowledge section."
             )]
         
-        response = f"# Claude Desktop Project Knowledge ({len(notes)} entries)\n\n"
+        parts = [f"# Claude Desktop Project Knowledge ({len(notes)} entries)\n\n"]
         for note in notes:
-            response += f"## {note['title']}\n"
-            response += f"**Created:** {note['created_at']}\n\n"
+            parts.append(f"## {note['title']}\n")
+            parts.append(f"**Created:** {note['created_at']}\n\n")
             content_preview = note['content'][:300] + "..." if len(note['content']) > 300 else note['content']
-            response += f"{content_preview}\n\n---\n\n"
+            parts.append(f"{content_preview}\n\n---\n\n")
         
-        return [TextContent(type="text", text=response)]
+        return [TextContent(type="text", text="".join(parts))]
     
     elif name == "check_project_context":
         context = knowledge_manager.get_project_context()
@@ -692,12 +1388,16 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
 
 async def main():
     """Main entry point for the MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    knowledge_writer.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        await knowledge_writer.stop()
 
 
 if __name__ == "__main__":
@@ -13,11 +13,20 @@ Features:
 """
 
 import asyncio
+import contextvars
 import json
 import os
+import re
+import signal
+import sqlite3
+import subprocess
 import sys
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 
 # MCP imports
@@ -25,7 +34,6 @@ try:
     from mcp.server import Server
     from mcp.server.stdio import stdio_server
     from mcp.types import Tool, Resource, TextContent, ImageContent
-    from pydantic import BaseModel
 except ImportError:
     print("Error: MCP SDK not installed. Run: pip install mcp", file=sys.stderr)
     sys.exit(1)
@@ -33,13 +41,163 @@ except ImportError:
 # Browser automation imports
 try:
     from playwright.async_api import async_playwright, Browser, Page
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 except ImportError:
     print("Error: Playwright not installed. Run: pip install playwright", file=sys.stderr)
     print("Then run: playwright install", file=sys.stderr)
     sys.exit(1)
 
 
-class ClaudeProject(BaseModel):
+# Claude Desktop's local database, resolved once
+CLAUDE_DB_PATH = os.path.expanduser("~/Library/Application Support/Claude/claudeSQLite.db")
+
+PROJECT_URL_PREFIX = "https://claude.ai/project/"
+CLAUDE_API_URL = "https://claude.ai/api"
+
+# Project references in notes and process command lines
+PROJECT_ID_RE = re.compile(r'project/([a-f0-9-]{36})')
+# MCP session of the tool call being handled; keys per-session state such as
+# the selected project. None outside a request (e.g. in tests or at startup).
+current_session: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar('mcp_session', default=None)
+
+# Persistent browser profile, and a marker written once a login has been seen in it
+BROWSER_DATA_DIR = os.path.expanduser("~/Library/Application Support/Claude/playwright-data")
+LOGIN_SENTINEL = Path(os.path.expanduser("~/Library/Application Support/Claude/.logged_in"))
+# Last discovered project list, so a restarted server can answer without scraping
+PROJECTS_CACHE_PATH = Path(os.path.expanduser("~/Library/Application Support/Claude/projects-cache.json"))
+
+# A visible window is only needed to log in: by default the browser runs headless once
+# LOGIN_SENTINEL exists. CLAUDE_BROWSER_HEADLESS=1 or =0 forces either mode.
+CLAUDE_BROWSER_HEADLESS = os.environ.get('CLAUDE_BROWSER_HEADLESS')
+
+# Requests aborted while automating; CLAUDE_BROWSER_BLOCK_ASSETS=0 loads pages in full.
+# Stylesheets stay allowed so visibility checks see the real layout.
+CLAUDE_BROWSER_BLOCK_ASSETS = os.environ.get('CLAUDE_BROWSER_BLOCK_ASSETS', '1') == '1'
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+BLOCKED_URL_MARKERS = ('analytics', 'segment.io', 'sentry.io', 'telemetry')
+
+# Page elements, tried in priority order. Specs are (css, text) pairs where text
+# matches like Playwright's case-insensitive :has-text(); plain lists are CSS only.
+LOGIN_BUTTON_SPECS = (
+    ('button', 'Log in'),
+    ('button', 'Sign in'),
+    ('a', 'Log in'),
+    ('a', 'Sign in'),
+    ('[data-testid="login-button"]', None),
+)
+USER_MENU_SPECS = (
+    ('[data-testid="user-menu"]', None),
+    ('button[aria-label*="user" i]', None),
+    ('button[aria-label*="profile" i]', None),
+    ('.user-menu', None),
+    ('.profile-menu', None),
+)
+PROJECT_CARD_SELECTORS = (
+    '[data-testid="project-card"]',
+    '.project-item',
+    'a[href*="/project/"]',
+    '[class*="project"]',
+)
+# Waited on after navigating: the first project links, and a project page's header
+PROJECT_LINK_SELECTOR = '[data-testid="project-card"], a[href*="/project/"]'
+PROJECT_HEADER_SELECTOR = 'h1, [data-testid="project-title"], .project-title'
+PROJECT_TITLE_SELECTORS = (
+    'h1', '[data-testid="project-title"]', '.project-title',
+    'title', '[class*="title"]',
+)
+ADD_BUTTON_SPECS = (
+    ('button', 'Add knowledge'),
+    ('button', 'Add'),
+    ('button', 'New'),
+    ('[data-testid="add-knowledge"]', None),
+    ('.add-knowledge-button', None),
+)
+TITLE_FIELD_SELECTORS = ('input[name="title"]', '[placeholder*="title" i]', 'input[type="text"]')
+CONTENT_FIELD_SELECTORS = ('textarea[name="content"]', '[placeholder*="content" i]', 'textarea')
+SUBMIT_BUTTON_SPECS = (
+    ('button', 'Save'),
+    ('button', 'Add'),
+    ('button', 'Submit'),
+    ('button[type="submit"]', None),
+)
+
+
+def specs_selector(specs) -> str:
+    """Join (css, text) specs into one Playwright selector that matches any of them"""
+    return ', '.join(f'{css}:has-text("{text}")' if text else css for css, text in specs)
+
+
+# In-page helpers, so a batch of selector checks costs one driver round-trip.
+# Specs are (css, text) pairs; text mirrors Playwright's case-insensitive :has-text().
+COUNT_MATCHES_JS = """(specs) => specs.map(([css, text]) => {
+    const needle = text && text.toLowerCase();
+    return Array.from(document.querySelectorAll(css)).filter(
+        el => !needle || (el.textContent || '').toLowerCase().includes(needle)
+    ).length;
+})"""
+# Which kind of page is showing: 'login_url', 'login_button' or 'logged_in', or null
+# while the app has not rendered either indicator yet (polled by wait_for_function)
+LOGIN_STATUS_JS = f"""([loginSpecs, userSpecs]) => {{
+    const href = location.href;
+    if (href.includes('login') || href.includes('auth')) return 'login_url';
+    const count = {COUNT_MATCHES_JS};
+    if (count(loginSpecs).some(Boolean)) return 'login_button';
+    if (count(userSpecs).some(Boolean)) return 'logged_in';
+    return null;
+}}"""
+FIRST_TITLE_JS = """(selectors) => {
+    for (const css of selectors) {
+        for (const el of document.querySelectorAll(css)) {
+            const text = el.textContent || '';
+            if (text.trim().length > 2 && text.length < 100) return text.trim();
+        }
+    }
+    return null;
+}"""
+# Project links under the given selectors as [{id, name}], deduplicated by id (first wins)
+LIST_PROJECTS_JS = """(selectors) => {
+    const out = new Map();
+    for (const css of selectors) {
+        for (const el of document.querySelectorAll(css)) {
+            const match = (el.getAttribute('href') || '').match(/\\/project\\/([^\\/?#]+)/);
+            if (match && !out.has(match[1])) out.set(match[1], (el.textContent || '').trim());
+        }
+    }
+    return [...out].map(([id, name]) => ({id, name}));
+}"""
+# Distinct project ids linked anywhere in the page HTML, matched without shipping the HTML out
+PROJECT_URL_IDS_JS = """() => [...new Set(Array.from(
+    document.documentElement.outerHTML.matchAll(/https:\\/\\/claude\\.ai\\/project\\/([a-zA-Z0-9-]+)/g),
+    match => match[1]
+))]"""
+# Fill the first match of each selector list, going through the native value setter
+# and an input event so framework-controlled fields pick the change up, then click the
+# first matching submit spec. Returns whether a submit button was clicked.
+FILL_FORM_JS = """([fields, submitSpecs]) => {
+    const setValue = (el, value) => {
+        const desc = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value');
+        if (desc && desc.set) desc.set.call(el, value); else el.textContent = value;
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+    };
+    for (const [selectors, value] of fields) {
+        for (const css of selectors) {
+            const el = document.querySelector(css);
+            if (el) { setValue(el, value); break; }
+        }
+    }
+    for (const [css, text] of submitSpecs) {
+        const needle = text && text.toLowerCase();
+        const button = Array.from(document.querySelectorAll(css)).find(
+            el => !needle || (el.textContent || '').toLowerCase().includes(needle)
+        );
+        if (button) { button.click(); return true; }
+    }
+    return false;
+}"""
+
+
+@dataclass(slots=True)
+class ClaudeProject:
     """Structure for Claude project information"""
     id: str
     name: str
@@ -48,111 +206,153 @@ class ClaudeProject(BaseModel):
     knowledge_count: Optional[int] = None
 
 
-class ProjectKnowledgeEntry(BaseModel):
+@dataclass(slots=True)
+class ProjectKnowledgeEntry:
     """Structure for project knowledge entries"""
     title: str
     content: str
     category: str = "general"
-    tags: List[str] = []
+    tags: List[str] = field(default_factory=list)
     importance: int = 3  # 1-5 scale
 
 
 class ClaudeWebProjectManager:
     """Manages Claude projects via web interface automation"""
     
+    CONTEXT_CACHE_TTL = 5.0  # seconds a detected project context is reused
+    PAGE_POOL_SIZE = 4  # tabs shared by concurrent tool calls
+    LOGIN_CACHE_TTL = 60.0  # seconds a successful login check is trusted
+    PROJECTS_CACHE_TTL = 300.0  # seconds a discovered project list is reused
+    PERSISTED_PROJECTS_TTL = 3600.0  # seconds a project list saved by an earlier run is reused
+    DB_DETECT_SQL = (
+        "SELECT title, content, created_at FROM notes "
+        "WHERE title LIKE '%project%' OR content LIKE '%project%' "
+        "ORDER BY created_at DESC LIMIT 5"
+    )
+    
     def __init__(self):
+        self.playwright = None
+        self.headless = True  # mode of the running browser, set on launch
         self.browser: Optional[Browser] = None
-        self.page: Optional[Page] = None
-        self.current_project: Optional[ClaudeProject] = None
+        self._init_lock = asyncio.Lock()
+        # Idle tabs of the persistent context; grows on demand up to PAGE_POOL_SIZE
+        self._page_pool: Optional[asyncio.Queue] = None
+        self._pool_pages = 0
+        # Selected project per MCP session, keyed on the session object itself:
+        # an entry goes away with its session, and a new session can never
+        # inherit a dead one's selection the way a reused id() could
+        self._current_projects: "weakref.WeakKeyDictionary[Any, ClaudeProject]" = weakref.WeakKeyDictionary()
+        self._sessionless_project: Optional[ClaudeProject] = None
         self.available_projects: List[ClaudeProject] = []
+        # (monotonic time of detection, detected project)
+        self._context_cache: Tuple[float, Optional[ClaudeProject]] = (0.0, None)
+        # (monotonic time, value) of the last successful login check
+        self._login_cache: Optional[Tuple[float, bool]] = None
+        # (monotonic expiry, projects) of the last project listing
+        self._projects_cache: Optional[Tuple[float, List[ClaudeProject]]] = None
+        self._projects_lock = asyncio.Lock()
+        self._org_uuid: Optional[str] = None  # Claude organization used for API calls
+        self._db_conn = None  # read-only connection to Claude Desktop's database
+        # File modification times behind the last database detection, and its result
+        self._db_mtime: Tuple[int, int] = (0, 0)
+        self._db_last_result: Optional[Dict] = None
+        self._load_projects_cache()
         
+    @property
+    def current_project(self) -> Optional[ClaudeProject]:
+        """Project selected by the MCP session of the current tool call"""
+        session = current_session.get()
+        if session is None:
+            return self._sessionless_project
+        return self._current_projects.get(session)
+    
+    @current_project.setter
+    def current_project(self, project: Optional[ClaudeProject]):
+        session = current_session.get()
+        if session is None:
+            self._sessionless_project = project
+        elif project is None:
+            self._current_projects.pop(session, None)
+        else:
+            self._current_projects[session] = project
+    
     async def detect_current_project_context(self) -> Optional[ClaudeProject]:
         """Dynamically detect current project context using multiple methods with timeout handling"""
+        detected_at, cached_project = self._context_cache
+        if cached_project and time.monotonic() - detected_at < self.CONTEXT_CACHE_TTL:
+            return cached_project
+        
+        project = await self._detect_project_context()
+        if project:
+            self._context_cache = (time.monotonic(), project)
+        return project
+    
+    def invalidate_context_cache(self):
+        """Forget the cached detection result, e.g. after the user switched projects"""
+        self._context_cache = (0.0, None)
+    
+    async def _detect_project_context(self) -> Optional[ClaudeProject]:
+        """Run the detection methods; see detect_current_project_context"""
         print("🔍 Detecting current project context dynamically...", file=sys.stderr)
         
-        detection_results = []
+        # Method 1: Environment Variables (instant, highest confidence)
+        env_result = self._detect_from_environment()
+        if env_result:
+            print(f"📧 Environment detection: {env_result['name']}", file=sys.stderr)
+            return self._mk_project(env_result)
         
-        # Method 1: Environment Variables (fast)
-        try:
-            env_result = self._detect_from_environment()
-            if env_result:
-                detection_results.append(("environment", env_result, 5))
-                print(f"📧 Environment detection: {env_result['name']}", file=sys.stderr)
-                # Return immediately if we have a high-confidence result
-                return ClaudeProject(
-                    id=env_result['id'],
-                    name=env_result['name'],
-                    url=f"https://claude.ai/project/{env_result['id']}"
-                )
-        except Exception as e:
-            print(f"Environment detection failed: {e}", file=sys.stderr)
-            
-        # Method 2: Database Analysis (fast)
-        try:
-            db_result = self._detect_from_database()
-            if db_result:
-                detection_results.append(("database", db_result, 4))
-                print(f"💾 Database detection: {db_result['name']}", file=sys.stderr)
-                # Return immediately if we have a good result
-                return ClaudeProject(
-                    id=db_result['id'],
-                    name=db_result['name'],
-                    url=f"https://claude.ai/project/{db_result['id']}"
-                )
-        except Exception as e:
-            print(f"Database detection failed: {e}", file=sys.stderr)
-            
-        # Method 3: Process Analysis (fast)
-        try:
-            process_result = self._detect_from_processes()
-            if process_result:
-                detection_results.append(("process", process_result, 3))
-                print(f"⚙️ Process detection: {process_result['name']}", file=sys.stderr)
-                # Return immediately if we have a result
-                return ClaudeProject(
-                    id=process_result['id'],
-                    name=process_result['name'],
-                    url=f"https://claude.ai/project/{process_result['id']}"
-                )
-        except Exception as e:
-            print(f"Process detection failed: {e}", file=sys.stderr)
+        # Methods 2-4 run concurrently: database and process detection block,
+        # so they run in worker threads; browser detection keeps its timeout
+        print("🌐 Running database, process and browser detection concurrently...", file=sys.stderr)
+        methods = [
+            ("database", "💾", 4),
+            ("process", "⚙️", 3),
+            ("browser", "🌐", 5),
+        ]
+        results = await asyncio.gather(
+            asyncio.to_thread(self._detect_from_database),
+            asyncio.to_thread(self._detect_from_processes),
+            asyncio.wait_for(self._detect_from_browser(), timeout=10.0),
+            return_exceptions=True
+        )
         
-        # Method 4: Browser Detection (slow, with timeout)
-        try:
-            print("🌐 Attempting browser detection with timeout...", file=sys.stderr)
-            browser_result = await asyncio.wait_for(
-                self._detect_from_browser(), 
-                timeout=10.0  # 10 second timeout
-            )
-            if browser_result:
-                detection_results.append(("browser", browser_result, 5))
-                print(f"🌐 Browser detection: {browser_result['name']}", file=sys.stderr)
-                return ClaudeProject(
-                    id=browser_result['id'],
-                    name=browser_result['name'],
-                    url=f"https://claude.ai/project/{browser_result['id']}"
-                )
-        except asyncio.TimeoutError:
-            print("⏰ Browser detection timed out (10s), skipping...", file=sys.stderr)
-        except Exception as e:
-            print(f"Browser detection failed: {e}", file=sys.stderr)
+        detection_results = []
+        for (method, icon, confidence), result in zip(methods, results):
+            if isinstance(result, asyncio.TimeoutError):
+                print("⏰ Browser detection timed out (10s), skipping...", file=sys.stderr)
+            elif isinstance(result, Exception):
+                print(f"{method.title()} detection failed: {result}", file=sys.stderr)
+            elif result:
+                print(f"{icon} {method.title()} detection: {result['name']}", file=sys.stderr)
+                detection_results.append((confidence, result))
+        
+        if detection_results:
+            # Highest confidence wins; max() keeps the first of equal ones
+            _, best = max(detection_results, key=lambda r: r[0])
+            return self._mk_project(best)
         
         print("❌ No project context detected from any method", file=sys.stderr)
         return None
     
+    @staticmethod
+    def _mk_project(result: Dict) -> ClaudeProject:
+        """Build a ClaudeProject from an {'id', 'name'} detection or discovery result"""
+        project_id = result['id']
+        return ClaudeProject(
+            id=project_id,
+            name=result.get('name') or f"Project {project_id[:8]}",
+            url=PROJECT_URL_PREFIX + project_id,
+            last_accessed=result.get('last_accessed')
+        )
+    
     def _detect_from_environment(self) -> Optional[Dict]:
         """Detect project from environment variables"""
-        try:
-            project_id = os.environ.get('CLAUDE_PROJECT_ID')
-            project_name = os.environ.get('CLAUDE_PROJECT_NAME')
-            
-            if project_id:
-                return {
-                    'id': project_id,
-                    'name': project_name or f"Project {project_id[:8]}"
-                }
-        except Exception as e:
-            print(f"Environment detection failed: {e}", file=sys.stderr)
+        project_id = os.environ.get('CLAUDE_PROJECT_ID')
+        if project_id:
+            return {
+                'id': project_id,
+                'name': os.environ.get('CLAUDE_PROJECT_NAME') or f"Project {project_id[:8]}"
+            }
         return None
     
     async def _detect_from_browser(self) -> Optional[Dict]:
@@ -163,33 +363,23 @@ class ClaudeWebProjectManager:
                 print("🚫 Browser not initialized, skipping browser detection to avoid timeout", file=sys.stderr)
                 return None
                 
-            # Get all pages/tabs with timeout
-            try:
-                pages = self.browser.pages
-                
-                for page in pages:
+            for page in self.browser.pages:
+                # Quick URL check first
+                url = page.url
+                if 'claude.ai/project/' in url:
+                    project_id = url.split('/project/')[-1].split('/')[0]
+                    
+                    # Try to get project name from page title with timeout
                     try:
-                        # Quick URL check first
-                        url = page.url
-                        if 'claude.ai/project/' in url:
-                            project_id = url.split('/project/')[-1].split('/')[0]
-                            
-                            # Try to get project name from page title with timeout
-                            try:
-                                title = await asyncio.wait_for(page.title(), timeout=2.0)
-                                project_name = title if title and 'Claude' not in title else f"Project {project_id[:8]}"
-                            except (asyncio.TimeoutError, Exception):
-                                project_name = f"Project {project_id[:8]}"
-                            
-                            return {
-                                'id': project_id,
-                                'name': project_name
-                            }
+                        title = await asyncio.wait_for(page.title(), timeout=2.0)
+                        project_name = title if title and 'Claude' not in title else f"Project {project_id[:8]}"
                     except Exception:
-                        continue
-                        
-            except Exception as e:
-                print(f"Error accessing browser pages: {e}", file=sys.stderr)
+                        project_name = f"Project {project_id[:8]}"
+                    
+                    return {
+                        'id': project_id,
+                        'name': project_name
+                    }
                     
         except Exception as e:
             print(f"Browser detection failed: {e}", file=sys.stderr)
@@ -198,32 +388,43 @@ class ClaudeWebProjectManager:
     def _detect_from_database(self) -> Optional[Dict]:
         """Detect project from Claude Desktop's database"""
         try:
-            import sqlite3
-            db_path = os.path.expanduser("~/Library/Application Support/Claude/claudeSQLite.db")
-            
-            if not os.path.exists(db_path):
+            # Skip the query while neither the database nor its WAL has changed
+            try:
+                db_mtime = os.stat(CLAUDE_DB_PATH).st_mtime_ns
+            except FileNotFoundError:
                 return None
-                
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Look for recent project-related activity
-                cursor.execute("""
-                    SELECT title, content, created_at FROM notes 
-                    WHERE title LIKE '%project%' OR content LIKE '%project%'
-                    ORDER BY created_at DESC LIMIT 5
-                """)
-                
-                for title, content, created_at in cursor.fetchall():
-                    # Extract project ID from content if available
-                    import re
-                    project_matches = re.findall(r'project/([a-f0-9-]{36})', content)
-                    if project_matches:
-                        project_id = project_matches[0]
-                        return {
-                            'id': project_id,
-                            'name': title or f"Project {project_id[:8]}"
-                        }
+            try:
+                wal_mtime = os.stat(CLAUDE_DB_PATH + "-wal").st_mtime_ns
+            except FileNotFoundError:
+                wal_mtime = 0
+            mtime = (db_mtime, wal_mtime)
+            if mtime == self._db_mtime:
+                return self._db_last_result
+            
+            conn = self._db_conn
+            if conn is None:
+                # Opened once and reused; detection runs in a worker thread
+                conn = sqlite3.connect(Path(CLAUDE_DB_PATH).as_uri() + "?mode=ro", uri=True,
+                                       check_same_thread=False)
+                conn.execute("PRAGMA query_only=1")
+                conn.execute("PRAGMA mmap_size=67108864")
+                self._db_conn = conn
+            
+            result = None
+            # Look for recent project-related activity
+            for title, content, created_at in conn.execute(self.DB_DETECT_SQL).fetchall():
+                # Extract project ID from content if available
+                project_match = PROJECT_ID_RE.search(content)
+                if project_match:
+                    project_id = project_match.group(1)
+                    result = {
+                        'id': project_id,
+                        'name': title or f"Project {project_id[:8]}"
+                    }
+                    break
+            
+            self._db_mtime, self._db_last_result = mtime, result
+            return result
                         
         except Exception as e:
             print(f"Database detection failed: {e}", file=sys.stderr)
@@ -232,17 +433,13 @@ class ClaudeWebProjectManager:
     def _detect_from_processes(self) -> Optional[Dict]:
         """Detect project from running processes"""
         try:
-            import subprocess
-            result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-            
             # Look for Claude processes with project information
-            for line in result.stdout.split('\n'):
+            for line in self._process_command_lines():
                 if 'Claude' in line and 'project' in line.lower():
                     # Try to extract project ID from command line
-                    import re
-                    project_matches = re.findall(r'project/([a-f0-9-]{36})', line)
-                    if project_matches:
-                        project_id = project_matches[0]
+                    project_match = PROJECT_ID_RE.search(line)
+                    if project_match:
+                        project_id = project_match.group(1)
                         return {
                             'id': project_id,
                             'name': f"Project {project_id[:8]}"
@@ -251,90 +448,221 @@ class ClaudeWebProjectManager:
         except Exception as e:
             print(f"Process detection failed: {e}", file=sys.stderr)
         return None
+    
+    @staticmethod
+    def _process_command_lines():
+        """Yield the command line of every running process"""
+        if os.path.isdir('/proc'):
+            # Linux: read /proc directly instead of forking ps
+            for pid in os.listdir('/proc'):
+                if not pid.isdigit():
+                    continue
+                try:
+                    with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                        cmdline = f.read()
+                except OSError:
+                    continue  # process exited or is not readable
+                yield cmdline.replace(b'\x00', b' ').decode('utf-8', 'ignore')
+        else:
+            # macOS has no /proc; ask ps for the command column only
+            result = subprocess.run(['ps', '-axo', 'command='], capture_output=True, text=True)
+            yield from result.stdout.split('\n')
         
     async def init_browser(self):
-        """Initialize browser for web automation"""
+        """Initialize browser for web automation; later calls reuse the running context"""
+        async with self._init_lock:
+            if self.browser:
+                return True
+            return await self._launch_browser()
+    
+    async def _launch_browser(self) -> bool:
+        """Start Playwright and open the persistent browser context"""
         try:
-            playwright = await async_playwright().start()
+            if not self.playwright:
+                self.playwright = await async_playwright().start()
             # Use persistent context to maintain login state
-            user_data_dir = os.path.expanduser("~/Library/Application Support/Claude/playwright-data")
+            print(f"🔧 Using browser data directory: {BROWSER_DATA_DIR}", file=sys.stderr)
             
-            print(f"🔧 Using browser data directory: {user_data_dir}", file=sys.stderr)
+            if CLAUDE_BROWSER_HEADLESS is not None:
+                self.headless = CLAUDE_BROWSER_HEADLESS == '1'
+            else:
+                self.headless = LOGIN_SENTINEL.exists()
             
-            self.browser = await playwright.chromium.launch_persistent_context(
-                user_data_dir=user_data_dir,
-                headless=False,  # Show browser window
+            self.browser = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir=BROWSER_DATA_DIR,
+                headless=self.headless,
                 viewport={'width': 1280, 'height': 720},
                 args=[
                     '--disable-blink-features=AutomationControlled',
                     '--disable-web-security',
                     '--no-sandbox',
-                    '--disable-setuid-sandbox'
+                    '--disable-setuid-sandbox',
+                    # Only text and attributes are read, so skip image decode and GPU work
+                    '--blink-settings=imagesEnabled=false',
+                    '--disable-gpu',
+                    '--disable-dev-shm-usage',
+                    '--disable-extensions'
                 ]
             )
             
-            self.page = await self.browser.new_page()
+            if CLAUDE_BROWSER_BLOCK_ASSETS:
+                await self.browser.route("**/*", self._route_request)
+            
+            self.browser.on("close", self._on_browser_closed)
             
             # Set a proper user agent
-            await self.page.set_extra_http_headers({
+            await self.browser.set_extra_http_headers({
                 'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             })
             
+            # Persistent contexts open with a blank tab; it seeds the page pool
+            page = self.browser.pages[0] if self.browser.pages else await self.browser.new_page()
+            self._page_pool = asyncio.Queue(maxsize=self.PAGE_POOL_SIZE)
+            self._page_pool.put_nowait(page)
+            self._pool_pages = 1
+            
             print("🌐 Loading Claude web interface...", file=sys.stderr)
-            await self.page.goto("https://claude.ai", wait_until='networkidle')
+            await page.goto("https://claude.ai", wait_until='domcontentloaded')
             
             print("✅ Browser initialized successfully", file=sys.stderr)
             return True
             
         except Exception as e:
             print(f"❌ Failed to initialize browser: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
+            await self._discard_browser()
+            return False
+    
+    async def _discard_browser(self):
+        """Close a half-initialized context, so the next init_browser launches a fresh one"""
+        browser = self.browser
+        if browser:
+            try:
+                browser.remove_listener("close", self._on_browser_closed)
+            except Exception:
+                pass
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"⚠️ Could not close browser context: {e}", file=sys.stderr)
+        self._on_browser_closed()
+    
+    @staticmethod
+    async def _route_request(route):
+        """Abort assets and telemetry the automation never reads"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+                marker in request.url for marker in BLOCKED_URL_MARKERS):
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    def _on_browser_closed(self, _context=None):
+        """Forget the context when its window is closed, so the next call relaunches it"""
+        self.browser = None
+        self._page_pool = None
+        self._pool_pages = 0
+    
+    @asynccontextmanager
+    async def _acquire_page(self):
+        """Borrow a tab for one tool call, so concurrent calls do not share a page"""
+        if not await self.init_browser():
+            raise RuntimeError("browser is not available")
+        pool = self._page_pool
+        if pool.empty() and self._pool_pages < self.PAGE_POOL_SIZE:
+            # The slot is reserved before awaiting, so concurrent callers
+            # cannot open more than PAGE_POOL_SIZE tabs
+            self._pool_pages += 1
+            page = await self._new_pool_page(pool)
+        else:
+            page = await pool.get()
+            if page.is_closed():
+                page = await self._new_pool_page(pool)
+        try:
+            yield page
+        finally:
+            # Tabs keep their last URL; browser detection reads project tabs from them
+            if pool is self._page_pool:
+                pool.put_nowait(page)
+    
+    async def _new_pool_page(self, pool: asyncio.Queue) -> Page:
+        """Open a tab for a reserved pool slot, giving the slot back if that fails"""
+        try:
+            return await self.browser.new_page()
+        except Exception:
+            # Otherwise every failure would shrink the pool for good, and
+            # once no slots were left pool.get() would wait forever
+            if pool is self._page_pool:
+                self._pool_pages -= 1
+            raise
+    
+    @staticmethod
+    async def _click_first(page: Page, specs) -> bool:
+        """Click the first spec with a match, probing all of them in one round-trip"""
+        counts = await page.evaluate(COUNT_MATCHES_JS, specs)
+        for (css, text), count in zip(specs, counts):
+            if count:
+                await page.locator(css, has_text=text).first.click()
+                return True
+        return False
+    
+    @staticmethod
+    async def _wait_for(page: Page, selector: str, state: str = 'attached', timeout: int = 5000) -> bool:
+        """Wait for a selector to reach a state, returning False on timeout"""
+        try:
+            await page.wait_for_selector(selector, state=state, timeout=timeout)
+            return True
+        except Exception:
             return False
     
-    async def detect_login_status(self) -> bool:
+    def invalidate_session_caches(self):
+        """Forget cached login status and project list, e.g. after being logged out"""
+        self._login_cache = None
+        self._projects_cache = None
+    
+    async def detect_login_status(self, page: Page) -> bool:
         """Check if user is logged into Claude"""
+        if self._login_cache and time.monotonic() - self._login_cache[0] < self.LOGIN_CACHE_TTL:
+            return True
+        logged_in = await self._check_login_status(page)
+        # Only a positive result is cached, so logging in takes effect on the next call
+        self._login_cache = (time.monotonic(), True) if logged_in else None
         try:
-            await self.page.wait_for_load_state('networkidle', timeout=15000)
-            
-            # Wait a bit more for dynamic content
-            await self.page.wait_for_timeout(3000)
+            if logged_in:
+                LOGIN_SENTINEL.touch()
+            elif LOGIN_SENTINEL.exists():
+                # Session expired: show the window on the next launch so the user can log in
+                LOGIN_SENTINEL.unlink()
+        except OSError:
+            pass
+        return logged_in
+    
+    async def _check_login_status(self, page: Page) -> bool:
+        """Inspect the page for login and user-menu indicators"""
+        try:
+            # Classify the page in the browser: the URL, then login buttons, then user menus.
+            # Polling returns as soon as any of them is conclusive.
+            try:
+                handle = await page.wait_for_function(
+                    LOGIN_STATUS_JS, arg=[LOGIN_BUTTON_SPECS, USER_MENU_SPECS], timeout=5000
+                )
+                status = await handle.json_value()
+            except PlaywrightTimeoutError:
+                status = 'unknown'
             
-            # Check URL first
-            current_url = self.page.url
+            current_url = page.url
             print(f"🌐 Current URL: {current_url}", file=sys.stderr)
             
-            if 'login' in current_url or 'auth' in current_url:
+            if status == 'login_url':
                 print("⚠️ On login page - please log in to Claude in the browser window", file=sys.stderr)
                 return False
             
-            # Check for various login/logout indicators
-            login_selectors = [
-                'button:has-text("Log in")',
-                'button:has-text("Sign in")',
-                'a:has-text("Log in")',
-                'a:has-text("Sign in")',
-                '[data-testid="login-button"]'
-            ]
-            
-            for selector in login_selectors:
-                if await self.page.locator(selector).count() > 0:
-                    print("⚠️ Login button found - please log in to Claude in the browser window", file=sys.stderr)
-                    return False
+            if status == 'login_button':
+                print("⚠️ Login button found - please log in to Claude in the browser window", file=sys.stderr)
+                return False
             
-            # Check for user menu or profile indicators
-            user_selectors = [
-                '[data-testid="user-menu"]',
-                'button[aria-label*="user" i]',
-                'button[aria-label*="profile" i]',
-                '.user-menu',
-                '.profile-menu'
-            ]
-            
-            for selector in user_selectors:
-                if await self.page.locator(selector).count() > 0:
-                    print("✅ User menu found - logged in successfully", file=sys.stderr)
-                    return True
+            if status == 'logged_in':
+                print("✅ User menu found - logged in successfully", file=sys.stderr)
+                return True
             
             # Check if we can access a protected page
             if 'claude.ai' in current_url and 'login' not in current_url:
@@ -348,75 +676,109 @@ class ClaudeWebProjectManager:
             print(f"⚠️ Could not determine login status: {e}", file=sys.stderr)
             return False
     
-    async def list_projects(self) -> List[ClaudeProject]:
-        """Discover all available Claude projects"""
+    async def _list_projects_via_api(self) -> Optional[List[ClaudeProject]]:
+        """List projects from Claude's JSON API with the browser's cookies; None if unavailable"""
         try:
-            if not await self.init_browser():
-                return []
+            # The context's request client shares the persistent profile's cookies
+            request = self.browser.request
+            if not self._org_uuid:
+                response = await request.get(f"{CLAUDE_API_URL}/organizations")
+                if not response.ok:
+                    print(f"⚠️ Claude API unavailable (HTTP {response.status}), using web interface", file=sys.stderr)
+                    return None
+                organizations = await response.json()
+                if not organizations:
+                    return None
+                self._org_uuid = organizations[0]['uuid']
             
-            if not await self.detect_login_status():
-                print("❌ Not logged into Claude. A browser window should have opened.", file=sys.stderr)
-                print("📋 Instructions:", file=sys.stderr)
-                print("   1. Look for the Chrome/Chromium browser window that opened", file=sys.stderr)
-                print("   2. Log in to Claude in that browser window", file=sys.stderr)
-                print("   3. Try this command again after logging in", file=sys.stderr)
-                print("   4. The browser window will stay open to maintain your session", file=sys.stderr)
-                return []
-            
-            # Navigate to projects page
-            await self.page.goto("https://claude.ai/projects")
-            await self.page.wait_for_load_state('networkidle')
+            response = await request.get(f"{CLAUDE_API_URL}/organizations/{self._org_uuid}/projects")
+            if not response.ok:
+                print(f"⚠️ Claude API unavailable (HTTP {response.status}), using web interface", file=sys.stderr)
+                self._org_uuid = None
+                return None
             
-            projects = []
+            return [self._mk_project({'id': item['uuid'], 'name': item.get('name'),
+                                      'last_accessed': item.get('updated_at')})
+                    for item in await response.json()]
             
-            # Look for project cards/links
-            project_selectors = [
-                '[data-testid="project-card"]',
-                '.project-item',
-                'a[href*="/project/"]',
-                '[class*="project"]'
-            ]
+        except Exception as e:
+            print(f"⚠️ Claude API request failed, using web interface: {e}", file=sys.stderr)
+            return None
+    
+    def _load_projects_cache(self):
+        """Restore the project list saved by an earlier run"""
+        try:
+            with open(PROJECTS_CACHE_PATH) as f:
+                data = json.load(f)
+            projects = [ClaudeProject(**item) for item in data['projects']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self.available_projects = projects
+        age = time.time() - data.get('ts', 0)
+        if 0 <= age < self.PERSISTED_PROJECTS_TTL:
+            self._projects_cache = (time.monotonic() + self.PERSISTED_PROJECTS_TTL - age, projects)
+    
+    def _save_projects_cache(self, projects: List[ClaudeProject]):
+        """Write the project list atomically for the next run"""
+        try:
+            PROJECTS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = PROJECTS_CACHE_PATH.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'ts': time.time(), 'projects': [asdict(p) for p in projects]}, f)
+            os.replace(tmp_path, PROJECTS_CACHE_PATH)
+        except OSError as e:
+            print(f"⚠️ Could not save project cache: {e}", file=sys.stderr)
+    
+    async def list_projects(self, force_refresh: bool = False) -> List[ClaudeProject]:
+        """Discover all available Claude projects, reusing a recent result"""
+        # The lock makes concurrent callers share one refresh instead of each scraping
+        async with self._projects_lock:
+            if not force_refresh and self._projects_cache and time.monotonic() < self._projects_cache[0]:
+                return self._projects_cache[1]
+            projects = await self._fetch_projects()
+            if projects:
+                self._projects_cache = (time.monotonic() + self.PROJECTS_CACHE_TTL, projects)
+                self._save_projects_cache(projects)
+            return projects
+    
+    async def _fetch_projects(self) -> List[ClaudeProject]:
+        """Fetch the project list from the API, or by scraping the projects page"""
+        try:
+            if not await self.init_browser():
+                return []
             
-            for selector in project_selectors:
-                try:
-                    elements = await self.page.locator(selector).all()
-                    for element in elements:
-                        try:
-                            # Extract project information
-                            text = await element.text_content()
-                            href = await element.get_attribute('href')
-                            
-                            if href and '/project/' in href:
-                                project_id = href.split('/project/')[-1].split('/')[0]
-                                project_name = text.strip() if text else f"Project {project_id[:8]}"
-                                
-                                project = ClaudeProject(
-                                    id=project_id,
-                                    name=project_name,
-                                    url=f"https://claude.ai/project/{project_id}"
-                                )
-                                
-                                if project not in projects:
-                                    projects.append(project)
-                                    
-                        except Exception:
-                            continue
-                            
-                except Exception:
-                    continue
+            # Fast path: one JSON request instead of rendering and scraping the projects page
+            projects = await self._list_projects_via_api()
+            if projects is not None:
+                self.available_projects = projects
+                print(f"🔍 Found {len(projects)} Claude projects", file=sys.stderr)
+                return projects
             
-            # Fallback: scan page text for project URLs
-            if not projects:
-                page_content = await self.page.content()
-                import re
-                project_urls = re.findall(r'https://claude\.ai/project/([a-zA-Z0-9-]+)', page_content)
+            async with self._acquire_page() as page:
+                # Navigate to projects page; logged-out sessions are redirected to login
+                await page.goto("https://claude.ai/projects", wait_until='domcontentloaded')
                 
-                for project_id in set(project_urls):
-                    projects.append(ClaudeProject(
-                        id=project_id,
-                        name=f"Project {project_id[:8]}",
-                        url=f"https://claude.ai/project/{project_id}"
-                    ))
+                if not await self.detect_login_status(page):
+                    print("❌ Not logged into Claude. A browser window should have opened.", file=sys.stderr)
+                    if self.headless:
+                        print("   The browser is headless; restart the server to get a window for logging in", file=sys.stderr)
+                    print("📋 Instructions:", file=sys.stderr)
+                    print("   1. Look for the Chrome/Chromium browser window that opened", file=sys.stderr)
+                    print("   2. Log in to Claude in that browser window", file=sys.stderr)
+                    print("   3. Try this command again after logging in", file=sys.stderr)
+                    print("   4. The browser window will stay open to maintain your session", file=sys.stderr)
+                    return []
+                
+                await self._wait_for(page, PROJECT_LINK_SELECTOR, timeout=10000)
+                
+                # Look for project cards/links
+                projects = [self._mk_project(item)
+                            for item in await page.evaluate(LIST_PROJECTS_JS, PROJECT_CARD_SELECTORS)]
+                
+                # Fallback: scan page text for project URLs
+                if not projects:
+                    projects = [self._mk_project({'id': project_id})
+                                for project_id in await page.evaluate(PROJECT_URL_IDS_JS)]
             
             self.available_projects = projects
             print(f"🔍 Found {len(projects)} Claude projects", file=sys.stderr)
@@ -429,67 +791,51 @@ class ClaudeWebProjectManager:
     
     async def access_current_project(self, project_id: str) -> bool:
         """Access a specific project directly by ID"""
+        self.invalidate_context_cache()
         try:
-            if not self.page:
-                if not await self.init_browser():
-                    return False
-            
-            # Go directly to the project
-            project_url = f"https://claude.ai/project/{project_id}"
-            print(f"🎯 Accessing project directly: {project_url}", file=sys.stderr)
-            
-            await self.page.goto(project_url, wait_until='networkidle')
-            await self.page.wait_for_timeout(3000)  # Wait for page to load
-            
-            # Check if we can access the project
-            current_url = self.page.url
-            print(f"📍 Current URL: {current_url}", file=sys.stderr)
-            
-            if project_id in current_url:
-                print("✅ Successfully accessed project!", file=sys.stderr)
+            async with self._acquire_page() as page:
+                # Go directly to the project
+                project_url = PROJECT_URL_PREFIX + project_id
+                print(f"🎯 Accessing project directly: {project_url}", file=sys.stderr)
                 
-                # Try to get project name from the page
-                project_name = "Current Project"
-                try:
-                    # Look for project title elements
-                    title_selectors = [
-                        'h1', '[data-testid="project-title"]', '.project-title', 
-                        'title', '[class*="title"]'
-                    ]
-                    
-                    for selector in title_selectors:
-                        elements = await self.page.locator(selector).all()
-                        for element in elements:
-                            text = await element.text_content()
-                            if text and len(text.strip()) > 2 and len(text) < 100:
-                                project_name = text.strip()
-                                break
-                        if project_name != "Current Project":
-                            break
-                    
-                except Exception:
-                    pass
-                
-                self.current_project = ClaudeProject(
-                    id=project_id,
-                    name=project_name,
-                    url=project_url
-                )
+                await page.goto(project_url, wait_until='domcontentloaded')
+                await self._wait_for(page, PROJECT_HEADER_SELECTOR)
                 
-                print(f"🎉 Project set: {project_name} (ID: {project_id})", file=sys.stderr)
-                return True
-            else:
-                print(f"❌ Could not access project. Current URL: {current_url}", file=sys.stderr)
-                return False
+                # Check if we can access the project
+                current_url = page.url
+                print(f"📍 Current URL: {current_url}", file=sys.stderr)
                 
+                if project_id in current_url:
+                    print("✅ Successfully accessed project!", file=sys.stderr)
+                    
+                    # Try to get project name from the page
+                    project_name = "Current Project"
+                    try:
+                        # Look for project title elements
+                        project_name = await page.evaluate(FIRST_TITLE_JS, PROJECT_TITLE_SELECTORS) or project_name
+                        
+                    except Exception:
+                        pass
+                    
+                    self.current_project = ClaudeProject(
+                        id=project_id,
+                        name=project_name,
+                        url=project_url
+                    )
+                    
+                    print(f"🎉 Project set: {project_name} (ID: {project_id})", file=sys.stderr)
+                    return True
+                else:
+                    print(f"❌ Could not access project. Current URL: {current_url}", file=sys.stderr)
+                    return False
+                    
         except Exception as e:
             print(f"❌ Failed to access project: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
             return False
     
-    async def select_project(self, project_id: str) -> bool:
-        """Select and navigate to a specific project"""
+    async def select_project(self, project_id: str, navigate: bool = False) -> bool:
+        """Select a specific project, optionally opening it in the browser"""
+        self.invalidate_context_cache()
         try:
             # Find project in available projects
             project = None
@@ -502,9 +848,11 @@ class ClaudeWebProjectManager:
                 print(f"❌ Project not found: {project_id}", file=sys.stderr)
                 return False
             
-            # Navigate to project
-            await self.page.goto(project.url)
-            await self.page.wait_for_load_state('networkidle')
+            # add_knowledge_to_project navigates on its own, so only open the project on request
+            if navigate:
+                async with self._acquire_page() as page:
+                    await page.goto(project.url, wait_until='domcontentloaded')
+                    await self._wait_for(page, PROJECT_HEADER_SELECTOR)
             
             self.current_project = project
             print(f"✅ Selected project: {project.name}", file=sys.stderr)
@@ -518,103 +866,104 @@ class ClaudeWebProjectManager:
     async def add_knowledge_to_project(self, entry: ProjectKnowledgeEntry) -> bool:
         """Add knowledge entry to current project via web interface"""
         try:
-            if not self.current_project:
+            project = self.current_project
+            if not project:
                 print("❌ No project selected", file=sys.stderr)
                 return False
             
-            # Navigate to project knowledge section
-            knowledge_url = f"{self.current_project.url}/knowledge"
-            await self.page.goto(knowledge_url)
-            await self.page.wait_for_load_state('networkidle')
-            
-            # Look for "Add knowledge" or similar button
-            add_buttons = [
-                'button:has-text("Add knowledge")',
-                'button:has-text("Add")',
-                'button:has-text("New")',
-                '[data-testid="add-knowledge"]',
-                '.add-knowledge-button'
-            ]
-            
-            clicked = False
-            for selector in add_buttons:
-                try:
-                    if await self.page.locator(selector).count() > 0:
-                        await self.page.click(selector)
-                        clicked = True
-                        break
-                except Exception:
-                    continue
-            
-            if not clicked:
-                print("❌ Could not find 'Add knowledge' button", file=sys.stderr)
-                return False
-            
-            # Wait for form to appear
-            await self.page.wait_for_timeout(2000)
-            
-            # Fill in knowledge entry
-            # Try different field selectors
-            title_selectors = ['input[name="title"]', '[placeholder*="title" i]', 'input[type="text"]:first']
-            content_selectors = ['textarea[name="content"]', '[placeholder*="content" i]', 'textarea:first']
-            
-            # Fill title
-            for selector in title_selectors:
-                try:
-                    if await self.page.locator(selector).count() > 0:
-                        await self.page.fill(selector, entry.title)
-                        break
-                except Exception:
-                    continue
-            
-            # Fill content
-            formatted_content = f"""Category: {entry.category}
+            async with self._acquire_page() as page:
+                # Navigate to project knowledge section
+                knowledge_url = f"{project.url}/knowledge"
+                await page.goto(knowledge_url, wait_until='domcontentloaded')
+                
+                if 'login' in page.url:
+                    self.invalidate_session_caches()
+                    print("❌ Redirected to login - please log in to Claude again", file=sys.stderr)
+                    return False
+                
+                # Look for "Add knowledge" or similar button
+                await self._wait_for(page, specs_selector(ADD_BUTTON_SPECS))
+                if not await self._click_first(page, ADD_BUTTON_SPECS):
+                    print("❌ Could not find 'Add knowledge' button", file=sys.stderr)
+                    return False
+                
+                # Wait for form to appear
+                await self._wait_for(page, ', '.join(TITLE_FIELD_SELECTORS + CONTENT_FIELD_SELECTORS))
+                
+                # Fill in knowledge entry
+                formatted_content = f"""Category: {entry.category}
 Tags: {', '.join(entry.tags)}
 Importance: {entry.importance}/5
 
 {entry.content}"""
-            
-            for selector in content_selectors:
-                try:
-                    if await self.page.locator(selector).count() > 0:
-                        await self.page.fill(selector, formatted_content)
-                        break
-                except Exception:
-                    continue
-            
-            # Submit form
-            submit_selectors = [
-                'button:has-text("Save")',
-                'button:has-text("Add")',
-                'button:has-text("Submit")',
-                'button[type="submit"]'
-            ]
-            
-            for selector in submit_selectors:
+                
+                fields = [
+                    [TITLE_FIELD_SELECTORS, entry.title],
+                    [CONTENT_FIELD_SELECTORS, formatted_content]
+                ]
+                
+                # Fill and submit in one round-trip, waiting for the save request itself
+                # rather than a fixed delay
                 try:
-                    if await self.page.locator(selector).count() > 0:
-                        await self.page.click(selector)
-                        break
-                except Exception:
-                    continue
-            
-            # Wait for save to complete
-            await self.page.wait_for_timeout(3000)
-            
-            print(f"✅ Added knowledge '{entry.title}' to project {self.current_project.name}", file=sys.stderr)
-            return True
-            
+                    async with page.expect_response(self._is_knowledge_save, timeout=10000) as response_info:
+                        try:
+                            submitted = await page.evaluate(FILL_FORM_JS, [fields, SUBMIT_BUTTON_SPECS])
+                        except Exception as e:
+                            # Fall back to Playwright's fill() and click() with their actionability checks
+                            print(f"⚠️ In-page form fill failed, retrying via Playwright: {e}", file=sys.stderr)
+                            for selectors, value in fields:
+                                await page.locator(', '.join(selectors)).first.fill(value)
+                            submitted = await self._click_first(page, SUBMIT_BUTTON_SPECS)
+                        if not submitted:
+                            raise LookupError("no submit button")
+                    response = await response_info.value
+                except (PlaywrightTimeoutError, LookupError):
+                    # No matching save request seen; fall back to waiting for the form to close
+                    await self._wait_for(page, ', '.join(CONTENT_FIELD_SELECTORS), state='hidden')
+                else:
+                    if not response.ok:
+                        print(f"❌ Saving knowledge failed (HTTP {response.status})", file=sys.stderr)
+                        return False
+                
+                print(f"✅ Added knowledge '{entry.title}' to project {project.name}", file=sys.stderr)
+                return True
+                
         except Exception as e:
             print(f"❌ Failed to add knowledge: {e}", file=sys.stderr)
             return False
     
+    @staticmethod
+    def _is_knowledge_save(response) -> bool:
+        """Match the request that stores a project knowledge entry"""
+        url = response.url
+        return (response.request.method in ('POST', 'PUT')
+                and ('/knowledge' in url or '/docs' in url))
+    
     async def cleanup(self):
         """Clean up browser resources"""
+        self.invalidate_session_caches()
+        try:
+            if self._db_conn:
+                self._db_conn.close()
+                self._db_conn = None
+        except Exception:
+            pass
         try:
             if self.browser:
                 await self.browser.close()
+                self.browser = None
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
         except Exception:
             pass
+        # Our context is closed, so any Singleton* profile locks left behind are stale;
+        # removing them spares the next launch Chromium's lock recovery
+        for lock_path in Path(BROWSER_DATA_DIR).glob('Singleton*'):
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
 
 
 # Initialize the web project manager
@@ -633,7 +982,9 @@ async def list_tools() -> List[Tool]:
             description="Discover and list all available Claude projects by browsing the web interface. No authentication needed - uses browser automation.",
             inputSchema={
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "force_refresh": {"type": "boolean", "description": "Ignore the cached project list and fetch it again", "default": False}
+                },
                 "additionalProperties": False
             }
         ),
@@ -643,7 +994,8 @@ async def list_tools() -> List[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "project_id": {"type": "string", "description": "Project ID or name to select"}
+                    "project_id": {"type": "string", "description": "Project ID or name to select"},
+                    "navigate": {"type": "boolean", "description": "Also open the project in the browser", "default": False}
                 },
                 "required": ["project_id"]
             }
@@ -697,9 +1049,16 @@ async def list_tools() -> List[Tool]:
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> List[TextContent]:
     """Handle tool calls"""
+    # Tool calls from different client sessions keep separate project selections
+    try:
+        current_session.set(server.request_context.session)
+    except LookupError:
+        pass
     
+    # Only list_claude_projects, add_project_knowledge, access_current_project and
+    # select_project with navigate=true launch the browser; the rest never touch it
     if name == "list_claude_projects":
-        projects = await web_manager.list_projects()
+        projects = await web_manager.list_projects(arguments.get("force_refresh", False))
         
         if not projects:
             return [TextContent(
@@ -719,7 +1078,7 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
     
     elif name == "select_project":
         project_id = arguments["project_id"]
-        success = await web_manager.select_project(project_id)
+        success = await web_manager.select_project(project_id, arguments.get("navigate", False))
         
         if success:
             return [TextContent(
@@ -820,8 +1179,47 @@ async def call_tool(name: str, arguments: dict) -> List[TextContent]:
         )]
 
 
+# Shutdown started by a signal handler. The event loop only keeps weak
+# references to tasks, so this set holds it until it finishes.
+shutdown_tasks: set = set()
+
+
+def request_shutdown(sig: signal.Signals):
+    """Start the shutdown for the first SIGTERM/SIGINT; signals arriving during it are ignored"""
+    if shutdown_tasks:
+        return
+    task = asyncio.create_task(shutdown(sig))
+    shutdown_tasks.add(task)
+    task.add_done_callback(shutdown_tasks.discard)
+
+
+async def shutdown(sig: signal.Signals):
+    """Clean up, then let the signal terminate the process as it would have"""
+    print(f"🛑 Received {sig.name}, shutting down", file=sys.stderr)
+    try:
+        await web_manager.cleanup()
+    except Exception as e:
+        print(f"⚠️ Cleanup failed during shutdown: {e}", file=sys.stderr)
+    finally:
+        # Re-sent with the default handlers back in place, so the process
+        # ends even if cleanup failed
+        loop = asyncio.get_running_loop()
+        for handled in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(handled)
+        os.kill(os.getpid(), sig)
+
+
 async def main():
     """Main entry point for the MCP server"""
+    # The browser is launched by the first tool call that needs it, not at startup
+    # SIGTERM/SIGINT (e.g. Claude Desktop quitting) still close the browser cleanly
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_shutdown, sig)
+        except (NotImplementedError, RuntimeError):
+            pass  # not supported on this platform
+    
     try:
         async with stdio_server() as (read_stream, write_stream):
             await server.run(
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Importable name for mcp-project-knowledge-server.py
+
+The server script's hyphenated filename can't be imported, so this module
+loads it once and takes its place in sys.modules; `import
+mcp_project_knowledge_server` then behaves like a regular import.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    __name__, Path(__file__).with_name("mcp-project-knowledge-server.py")
+)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
@@ -4,120 +4,300 @@ Test script for the Claude Project Knowledge MCP Server
 """
 
 import asyncio
+import io
 import json
+import os
 import sys
-from pathlib import Path
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache
 
-# Add the current directory to Python path to import our server
-sys.path.insert(0, str(Path(__file__).parent))
-
-# Import the knowledge manager directly for testing
-import importlib.util
-spec = importlib.util.spec_from_file_location("mcp_project_knowledge_server", "mcp-project-knowledge-server.py")
-mcp_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(mcp_module)
+# The server script's filename has hyphens; this shim module imports it
+import mcp_project_knowledge_server as mcp_module
 
 ClaudeProjectKnowledgeManager = mcp_module.ClaudeProjectKnowledgeManager
 ProjectKnowledgeEntry = mcp_module.ProjectKnowledgeEntry
 ProjectInstruction = mcp_module.ProjectInstruction
 
+# Server metadata checked by test_mcp_protocol, resolved once at load
+SERVER_META = {"type": type(mcp_module.server).__name__, "name": mcp_module.server.name}
+
+# Test data, built once when the module loads; the manager only reads these
+# models, and a variant can be made with model_copy(update={...})
+TEST_ENTRY = ProjectKnowledgeEntry(
+    title="Test Knowledge",
+    content="This is a test knowledge entry to verify the MCP server works correctly.",
+    category="technical",
+    # "round trip" is a multi-word tag whose words appear nowhere else in the entry
+    tags=["test", "mcp", "verification", "round trip"],
+    importance=4
+)
+TEST_INSTRUCTION = ProjectInstruction(
+    section="testing",
+    content="Always run tests before deploying changes",
+    priority=5
+)
+BULK_ENTRIES = [
+    ProjectKnowledgeEntry(
+        title=f"Bulk Knowledge {i}",
+        content=f"Bulk-loaded knowledge entry number {i}.",
+        category="technical",
+        # A tag and importance of its own, so rows attached to the wrong entry show up
+        tags=["bulk", "test", f"batch-{i}"],
+        importance=i + 1
+    )
+    for i in range(1, 4)
+]
+BULK_INSTRUCTIONS = [
+    ProjectInstruction(section="bulk-style", content="Prefer batched writes", priority=3),
+    ProjectInstruction(section="testing", content="Run the test suite before every commit", priority=4)
+]
+
+# Use a test database: in memory, so nothing touches the disk, unless
+# CLAUDE_TEST_ON_DISK=1 asks for a real file (e.g. to exercise WAL). That
+# file is a fresh temporary one, so a run never sees rows a crashed run left.
+ON_DISK = os.environ.get("CLAUDE_TEST_ON_DISK") == "1"
+if ON_DISK:
+    with tempfile.NamedTemporaryFile(prefix="test_claude_knowledge_", suffix=".db", delete=False) as _db_file:
+        TEST_DB_PATH = _db_file.name
+else:
+    TEST_DB_PATH = "file:test_km?mode=memory&cache=shared"
+
+@lru_cache(maxsize=1)
+def get_km(db_path: str = TEST_DB_PATH):
+    """Create the test knowledge manager once and share it between the tests"""
+    # The manager keeps one connection for all tests. The default in-memory
+    # database has no journal file or fsync at all; the on-disk one runs in
+    # WAL mode with synchronous=NORMAL, so commits skip per-commit fsyncs
+    return ClaudeProjectKnowledgeManager(db_path)
+
+def cleanup_test_db():
+    """Close the shared manager and remove the test database"""
+    # An in-memory database vanishes on close, and closing a file first
+    # checkpoints the WAL so no -wal/-shm files are left behind
+    get_km().close()
+    get_km.cache_clear()
+    if ON_DISK:
+        for path in (TEST_DB_PATH, f"{TEST_DB_PATH}-wal", f"{TEST_DB_PATH}-shm"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    print("🧹 Cleaned up test database")
+
+@contextmanager
+def buffered_stdout():
+    """Collect a test phase's prints and write them to stdout in one go"""
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            yield
+    finally:
+        # Flushed even when the phase fails, so its progress stays visible
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
 async def test_knowledge_manager():
     """Test the knowledge manager functionality"""
     print("🧪 Testing Claude Project Knowledge Manager...")
     
-    # Use a test database
-    test_db_path = "/tmp/test_claude_knowledge.db"
-    
-    # Initialize knowledge manager
-    km = ClaudeProjectKnowledgeManager(test_db_path)
+    km = get_km()
     print("✅ Knowledge manager initialized")
     
-    # Test 1: Add knowledge entry
-    print("\n📝 Test 1: Adding knowledge entry...")
-    entry = ProjectKnowledgeEntry(
-        title="Test Knowledge",
-        content="This is a test knowledge entry to verify the MCP server works correctly.",
-        category="technical",
-        tags=["test", "mcp", "verification"],
-        importance=4
+    # Tests 1, 3 and 6 write to different tables and don't depend on each
+    # other, so they are issued together like concurrent tool calls; the
+    # manager's lock serializes them on its one connection, while each
+    # call's Python-side preparation overlaps the others
+    entry = TEST_ENTRY
+    instruction = TEST_INSTRUCTION
+    knowledge_id, success, context_success = await asyncio.gather(
+        asyncio.to_thread(km.add_knowledge, entry),
+        asyncio.to_thread(km.update_instruction, instruction),
+        asyncio.to_thread(km.update_contexts, [
+            ("current_test", "Running MCP server functionality tests", "Testing the MCP integration"),
+            ("phase", "unit", "test_mcp_server.py run")
+        ])
     )
     
-    knowledge_id = km.add_knowledge(entry)
+    # Test 1: Add knowledge entry
+    print("\n📝 Test 1: Adding knowledge entry...")
     print(f"✅ Added knowledge entry with ID: {knowledge_id}")
     
+    # Test 3: Add instruction
+    print("\n📋 Test 3: Adding project instruction...")
+    print(f"✅ Instruction added: {success}")
+    
+    # Test 6: Update context
+    print("\n🎯 Test 6: Updating project context...")
+    print(f"✅ Context updated: {context_success}")
+    
+    # Tests 2, 4, 5 and 7 only read what the writes above stored, so they are
+    # issued together from worker threads, the way the server's tool handlers call the manager
+    results, knowledge_count, instruction_count, context = await asyncio.gather(
+        asyncio.to_thread(km.search_knowledge, "test"),
+        asyncio.to_thread(km.count_knowledge),
+        asyncio.to_thread(km.count_instructions),
+        asyncio.to_thread(km.get_context)
+    )
+    
     # Test 2: Search knowledge
     print("\n🔍 Test 2: Searching knowledge...")
-    results = km.search_knowledge("test")
     print(f"✅ Found {len(results)} results for 'test'")
     if results:
         print(f"   - Title: {results[0]['title']}")
         print(f"   - Category: {results[0]['category']}")
         print(f"   - Importance: {results[0]['importance']}")
+        # Tags come back from knowledge_tags in the order they were given
+        assert results[0]['tags'] == TEST_ENTRY.tags
+        print(f"   - Tags: {', '.join(results[0]['tags'])}")
     
-    # Test 3: Add instruction
-    print("\n📋 Test 3: Adding project instruction...")
-    instruction = ProjectInstruction(
-        section="testing",
-        content="Always run tests before deploying changes",
-        priority=5
-    )
+    # Test 2b: Repeated search is answered from the result cache
+    print("\n♻️ Test 2b: Repeating the search...")
+    hits = km.search_cache_hits
+    repeated = km.search_knowledge("test")
+    assert repeated == results
+    assert km.search_cache_hits == hits + 1
+    # Each hit is a copy, so a caller changing its result can't corrupt the cache
+    repeated[0]['tags'].append("changed")
+    repeated.clear()
+    assert km.search_knowledge("test") == results
+    print("✅ Repeated search served from the cache")
     
-    success = km.update_instruction(instruction)
-    print(f"✅ Instruction added: {success}")
+    # Test 2c: The full-text index answers searches and agrees with the LIKE scan
+    print("\n🗂️ Test 2c: Comparing full-text search with the LIKE fallback...")
+    assert km.fts_enabled, "FTS5 index was not created"
+    like_km = ClaudeProjectKnowledgeManager(TEST_DB_PATH, use_fts=False)
+    try:
+        # Title/content words, mid-word and cross-word substrings, a partial
+        # tag, one word of a multi-word tag and the whole multi-word tag; then
+        # queries that must match nothing, including punctuation a word-based
+        # index would reduce to a prefix ("C++" -> c*, which hits "correctly")
+        expected = [r['id'] for r in results]
+        cases = [(query, expected) for query in (
+            "test", "nowle", "server wo", "verifica", "trip", "round trip"
+        )] + [(query, []) for query in ("C++", "zz", "x_y")]
+        for query, want in cases:
+            fts_ids = [r['id'] for r in km.search_knowledge(query)]
+            like_ids = [r['id'] for r in like_km.search_knowledge(query)]
+            assert fts_ids == like_ids == want, (query, fts_ids, like_ids)
+    finally:
+        like_km.close()
+    print(f"✅ FTS5 and LIKE searches agree on {len(cases)} word, substring, tag and punctuation queries")
     
     # Test 4: Get all knowledge
     print("\n📚 Test 4: Getting all knowledge...")
-    all_knowledge = km.get_all_knowledge()
-    print(f"✅ Retrieved {len(all_knowledge)} knowledge entries")
+    # Counted in SQL; the entries themselves are streamed, not listed
+    assert knowledge_count == 1
+    assert next(km.iter_knowledge())['title'] == entry.title
+    print(f"✅ Retrieved {knowledge_count} knowledge entries")
     
     # Test 5: Get all instructions
     print("\n📖 Test 5: Getting all instructions...")
-    all_instructions = km.get_all_instructions()
-    print(f"✅ Retrieved {len(all_instructions)} instructions")
-    
-    # Test 6: Update context
-    print("\n🎯 Test 6: Updating project context...")
-    context_success = km.update_context(
-        "current_test", 
-        "Running MCP server functionality tests",
-        "Testing the MCP integration"
-    )
-    print(f"✅ Context updated: {context_success}")
+    assert instruction_count == 1
+    print(f"✅ Retrieved {instruction_count} instructions")
     
     # Test 7: Get context
     print("\n🌐 Test 7: Getting project context...")
-    context = km.get_context()
+    assert len(context) == 2
     print(f"✅ Retrieved context with {len(context)} items")
     for key, data in context.items():
         print(f"   - {key}: {data['value']}")
     
-    print("\n🎉 All tests completed successfully!")
+    # Test 8: Bulk load
+    print("\n📦 Test 8: Bulk loading knowledge and instructions...")
+    entries = BULK_ENTRIES
+    instructions = BULK_INSTRUCTIONS
+    bulk_ids = km.add_knowledge_bulk(entries)
+    km.update_instructions(instructions)
+    print(f"✅ Added {len(bulk_ids)} knowledge entries in one transaction")
+    
+    # Check every bulk-loaded row with one tag lookup instead of one search
+    # per entry; the returned IDs are notes IDs, so rows are matched on title
+    assert km.count_knowledge() == 1 + len(entries)
+    stored = {item['title']: item for item in km.get_knowledge_by_tags(["bulk"])}
+    assert sorted(stored) == sorted(e.title for e in entries)
+    for e in entries:
+        item = stored[e.title]
+        assert (item['category'], item['importance'], item['tags']) == (e.category, e.importance, e.tags), item
+    print(f"✅ Verified {len(stored)} bulk-loaded rows and their tags")
+    
+    # The bulk load committed, so the cached 'test' search must not be reused
+    assert len(km.search_knowledge("test")) == len(results) + len(entries)
+    print("✅ Search cache invalidated by the bulk load")
+    print(f"✅ Knowledge entries now: {km.count_knowledge()}")
+    print(f"✅ Instructions now: {km.count_instructions()} (the 'testing' section was updated in place)")
     
-    # Clean up test database
-    import os
-    if os.path.exists(test_db_path):
-        os.remove(test_db_path)
-        print("🧹 Cleaned up test database")
+    print("\n🎉 All tests completed successfully!")
 
-def test_mcp_protocol():
+async def test_mcp_protocol():
     """Test MCP protocol integration"""
     print("\n🔌 Testing MCP Protocol Integration...")
     
-    # Import MCP server components
-    server = mcp_module.server
-    
     # Check that server is properly initialized
-    print(f"✅ MCP Server created: {type(server).__name__}")
-    print(f"✅ Server name: {server.name}")
+    print(f"✅ MCP Server created: {SERVER_META['type']}")
+    print(f"✅ Server name: {SERVER_META['name']}")
     
     # Verify the server has the required MCP components
     print("✅ MCP Server appears to be properly configured")
     print("   - Ready to handle list_tools requests")
     print("   - Ready to handle call_tool requests") 
-    print("   - Database operations tested and working")
+    stats = await asyncio.to_thread(get_km().get_improvement_stats)
+    print(f"   - Database operations tested and working ({stats['count']} entries)")
     
     print("🎉 MCP Protocol integration ready!")
 
+async def test_concurrent(managers: int = 4):
+    """Run the same mixed workload from several managers on one database at once"""
+    print("\n🚦 Testing concurrent access from several managers...")
+    
+    # A real WAL file even in the default in-memory mode: shared-cache memory
+    # databases use table locks that fail instead of waiting, unlike WAL
+    with tempfile.NamedTemporaryFile(prefix="test_claude_concurrent_", suffix=".db", delete=False) as db_file:
+        db_path = db_file.name
+    # Created one after another, so only the first runs the schema setup
+    kms = [ClaudeProjectKnowledgeManager(db_path) for _ in range(managers)]
+    try:
+        def workload(i, km):
+            return [
+                asyncio.to_thread(km.add_knowledge, TEST_ENTRY.model_copy(update={"title": f"Concurrent Knowledge {i}"})),
+                asyncio.to_thread(km.search_knowledge, "concurrent"),
+                asyncio.to_thread(km.update_instruction, TEST_INSTRUCTION.model_copy(update={"section": f"concurrent-{i}"})),
+                asyncio.to_thread(km.get_context)
+            ]
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(call for i, km in enumerate(kms) for call in workload(i, km)))
+        elapsed = time.perf_counter() - start
+        
+        # Every manager's writes landed, and each sees the others' commits
+        for km in kms:
+            assert km.count_knowledge() == managers
+            assert km.count_instructions() == managers
+            assert len(km.search_knowledge("concurrent")) == managers
+        print(f"✅ {managers} managers ran {managers * 4} calls concurrently in {elapsed * 1000:.1f} ms")
+    finally:
+        for km in kms:
+            km.close()
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+async def run_all():
+    """Run both test phases on one event loop"""
+    try:
+        with buffered_stdout():
+            await test_knowledge_manager()
+        with buffered_stdout():
+            await test_mcp_protocol()
+        with buffered_stdout():
+            await test_concurrent()
+    finally:
+        # Runs even when a test fails, so no database file is left behind
+        with buffered_stdout():
+            cleanup_test_db()
+
 if __name__ == "__main__":
-    asyncio.run(test_knowledge_manager())
-    test_mcp_protocol()
\ No newline at end of file
+    asyncio.run(run_all())
\ No newline at end of file